@@ -1,15 +1,20 @@
 # app.py (FULL REPLACEMENT)
 import uuid
+import sqlite3
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from db import init_db, get_conn, wipe_all
+from db import init_db, get_conn, delete_all_rows, bulk_insert_orders, bulk_write_pragmas, db_file_stamp
 from parsing import parse_orders_and_items  # returns: orders_df, items_df, checklist_df, catalog_df, issues_df
 
 
@@ -27,28 +32,74 @@ def get_setting(name: str, default: str | None = None) -> str | None:
     # Local / env (from .env via load_dotenv)
     return os.getenv(name, default)
 
-GOOGLE_MAPS_API_KEY = get_setting("GOOGLE_MAPS_API_KEY")
-ORIGIN_ADDRESS = get_setting("ORIGIN_ADDRESS", "55 River Oaks Pl, San Jose, CA")
+@st.cache_resource
+def load_config() -> dict[str, str | None]:
+    """
+    Settings resolved once per process instead of re-reading secrets/env on every rerun.
+    """
+    return {
+        "GOOGLE_MAPS_API_KEY": get_setting("GOOGLE_MAPS_API_KEY"),
+        "ORIGIN_ADDRESS": get_setting("ORIGIN_ADDRESS", "55 River Oaks Pl, San Jose, CA"),
+    }
+
+_config = load_config()
+GOOGLE_MAPS_API_KEY = _config["GOOGLE_MAPS_API_KEY"]
+ORIGIN_ADDRESS = _config["ORIGIN_ADDRESS"]
 
 if not GOOGLE_MAPS_API_KEY:
     raise RuntimeError("Missing GOOGLE_MAPS_API_KEY (set in .env locally or Streamlit Secrets in Cloud).")
 
 
+def normalize_address(address: str) -> str:
+    """
+    Case / whitespace variants of one address share a distance cache entry.
+    """
+    return " ".join(address.split()).lower()
+
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+# Distance Matrix accepts up to 25 destinations per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    One pooled session per process: reruns reuse the TLS connection to Google
+    instead of a fresh handshake per lookup. Transient errors are retried with backoff;
+    raise_on_status=False hands the final response to the status check below.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+    return session
+
+
 def compute_distance_miles_google(destination_address: str) -> float:
+    return _distance_miles_google_cached(normalize_address(destination_address))
+
+
+def _distance_matrix_elements(destinations: list[str]) -> list[dict]:
+    """
+    One Distance Matrix request from ORIGIN_ADDRESS; returns one element per destination.
+    """
     if not GOOGLE_MAPS_API_KEY:
         raise RuntimeError("GOOGLE_MAPS_API_KEY not set in .env")
 
-    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-
     params = {
         "origins": ORIGIN_ADDRESS,
-        "destinations": destination_address,
+        "destinations": "|".join(destinations),
         "mode": "driving",
         "units": "imperial",
         "key": GOOGLE_MAPS_API_KEY,
     }
 
-    response = requests.get(url, params=params, timeout=10)
+    response = get_http_session().get(DISTANCE_MATRIX_URL, params=params, timeout=10)
 
     if response.status_code != 200:
         raise RuntimeError(f"Google API error: HTTP {response.status_code}")
@@ -58,14 +109,35 @@ def compute_distance_miles_google(destination_address: str) -> float:
     if data.get("status") != "OK":
         raise RuntimeError(f"Google API error: {data.get('status')}")
 
-    element = data["rows"][0]["elements"][0]
+    return data["rows"][0]["elements"]
+
+
+def _element_miles(element: dict) -> float:
+    distance_text = element["distance"]["text"]  # e.g. "3.4 mi"
+    return float(distance_text.replace(" mi", "").replace(",", ""))
+
+
+# Errors are not cached, so a failed lookup is retried on the next click
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def _distance_miles_google_cached(destination_address: str) -> float:
+    element = _distance_matrix_elements([destination_address])[0]
 
     if element.get("status") != "OK":
         raise RuntimeError(f"Distance lookup failed: {element.get('status')}")
 
-    distance_text = element["distance"]["text"]  # e.g. "3.4 mi"
-    miles = float(distance_text.replace(" mi", "").replace(",", ""))
+    return _element_miles(element)
 
+
+def compute_distances_miles_google(addresses: list[str]) -> list[float | None]:
+    """
+    Many destinations in ceil(len / 25) requests instead of one request each.
+    None where Google couldn't route that address (element status != OK).
+    """
+    miles: list[float | None] = []
+    for start in range(0, len(addresses), DISTANCE_MATRIX_MAX_DESTINATIONS):
+        chunk = [normalize_address(a) for a in addresses[start:start + DISTANCE_MATRIX_MAX_DESTINATIONS]]
+        for element in _distance_matrix_elements(chunk):
+            miles.append(_element_miles(element) if element.get("status") == "OK" else None)
     return miles
 
 
@@ -73,15 +145,34 @@ def compute_distance_miles_google(destination_address: str) -> float:
 # Page setup
 # -----------------------------
 st.set_page_config(page_title="Order Checklist", layout="wide")
-init_db()
+
+
+@st.cache_resource
+def init_db_once() -> None:
+    """
+    Schema setup / migrations once per process. init_db recreates triggers, so running it
+    on every rerun would rewrite the schema (and move db_file_stamp) each time.
+    """
+    init_db()
+
+
+init_db_once()
 st.title("Orders")
 
+# Fee tiers: < 2 mi, < 5 mi, < 10 mi, < 20 mi, 20+ mi
+_FEE_TIER_MILES = np.array([2.0, 5.0, 10.0, 20.0])
+_FEE_TIER_FEES = np.array([1.99, 2.99, 4.99, 6.99, 9.99])
+
+
+def delivery_fees_batch(miles) -> np.ndarray:
+    """
+    Vectorized tier lookup: one searchsorted over all distances instead of a per-order if-ladder.
+    """
+    return _FEE_TIER_FEES[np.searchsorted(_FEE_TIER_MILES, miles, side="right")]
+
+
 def delivery_fee_from_miles(miles: float) -> float:
-    if miles < 2: return 1.99
-    if miles < 5: return 2.99
-    if miles < 10: return 4.99
-    if miles < 20: return 6.99
-    return 9.99
+    return float(delivery_fees_batch(miles))
 
 def needs_distance_recalc(existing_address: str | None, new_address: str, existing_miles: float | None) -> bool:
     if not new_address.strip():
@@ -92,6 +183,79 @@ def needs_distance_recalc(existing_address: str | None, new_address: str, existi
         return True
     return existing_address.strip() != new_address.strip()
 
+# -----------------------------
+# SQL statements
+# -----------------------------
+# Kept as module-level constants so every call passes the identical string and
+# hits sqlite3's per-connection prepared-statement cache (see db.get_conn).
+SQL_INSERT_ORDER = """
+    INSERT INTO orders (
+        public_uuid, customer, total_dollar,
+        is_paid, wants_delivery, is_fulfilled, is_delivered
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_SELECT_ORDERS = "SELECT * FROM orders ORDER BY created_at DESC"
+SQL_SELECT_CATALOG = "SELECT item_name, unit_price FROM catalog ORDER BY item_name ASC"
+SQL_SELECT_ORDER_HEADER = "SELECT customer, total_dollar FROM orders WHERE order_id = ?"
+SQL_SELECT_ORDER_ITEMS = """
+    SELECT item_id, name, quantity, price, COALESCE(packed_quantity, 0) AS packed_quantity
+    FROM items
+    WHERE order_id = ?
+    ORDER BY name ASC
+"""
+SQL_UPDATE_ORDER_FLAGS = "UPDATE orders SET is_paid = ?, is_delivered = ?, is_handed_off = ? WHERE order_id = ?"
+# Only rows whose packed state actually changes are touched, so the rollup trigger fires
+# once per changed item and total_dollar / item_count are never recomputed.
+SQL_PACK_ALL_ITEMS = "UPDATE items SET packed_quantity = quantity WHERE order_id = ? AND packed_quantity <> quantity"
+SQL_UNPACK_ALL_ITEMS = "UPDATE items SET packed_quantity = 0 WHERE order_id = ? AND packed_quantity <> 0"
+# (order_id, name) is unique, so "add to order" is one statement: insert or bump the existing row.
+# DO UPDATE expressions see the existing row, so packed is clamped to the new quantity.
+SQL_ADD_ITEM_TO_ORDER = """
+    INSERT INTO items(order_id, name, quantity, price, is_checked, packed_quantity)
+    VALUES(?, ?, ?, ?, 0, 0)
+    ON CONFLICT(order_id, name) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        price = excluded.price,
+        packed_quantity = MIN(packed_quantity, quantity + excluded.quantity)
+"""
+SQL_UPDATE_ITEM_QTY = "UPDATE items SET quantity = ?, packed_quantity = ? WHERE item_id = ?"
+SQL_DELETE_ITEM = "DELETE FROM items WHERE item_id = ?"
+SQL_SELECT_ORDERS_MISSING_DISTANCE = """
+    SELECT order_id, delivery_address FROM orders
+    WHERE wants_delivery = 1
+      AND TRIM(COALESCE(delivery_address, '')) <> ''
+      AND delivery_distance_miles IS NULL
+"""
+SQL_UPDATE_ORDER_DISTANCE = """
+    UPDATE orders
+    SET delivery_distance_miles = ?,
+        delivery_fee = ?,
+        delivery_distance_computed_at = datetime('now'),
+        delivery_distance_source = 'google'
+    WHERE order_id = ?
+"""
+SQL_SAVE_ORDER_DELIVERY = """
+    UPDATE orders
+    SET delivery_address = ?,
+        delivery_distance_miles = ?,
+        delivery_fee = ?,
+        delivery_distance_computed_at = datetime('now'),
+        delivery_distance_source = 'google'
+    WHERE order_id = ?
+"""
+SQL_SAVE_ORDER_PAYMENT = "UPDATE orders SET amount_received = ?, change_given = ? WHERE order_id = ?"
+SQL_DELETE_ORDER_ITEMS = "DELETE FROM items WHERE order_id = ?"
+SQL_DELETE_ORDER = "DELETE FROM orders WHERE order_id = ?"
+SQL_UPSERT_CATALOG = """
+    INSERT INTO catalog(item_name, unit_price)
+    VALUES(?, ?)
+    ON CONFLICT(item_name) DO UPDATE SET unit_price=excluded.unit_price
+"""
+# orders.order_id is the rowid, so the FTS rowids are the order_ids
+SQL_SEARCH_ORDER_IDS = "SELECT rowid AS order_id FROM orders_fts WHERE orders_fts MATCH ?"
+
+
 @st.dialog("New order")
 def new_order_modal():
     customer = st.text_input("Customer name", placeholder="e.g. Chocolaty")
@@ -103,31 +267,22 @@ def new_order_modal():
 
     c1, c2 = st.columns(2)
     if c1.button("Create order", type="primary", disabled=(not customer.strip())):
-        conn = get_conn()
-        try:
-            order_id = str(uuid.uuid4())
-            cur = conn.cursor()
-            cur.execute(
-                """
-                INSERT INTO orders (
-                    order_id, customer, total_dollar,
-                    is_paid, wants_delivery, is_fulfilled, is_delivered
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+        conn = get_session_conn()
+        with conn:
+            cur = conn.execute(
+                SQL_INSERT_ORDER,
                 (
-                    order_id,
+                    str(uuid.uuid4()),
                     customer.strip(),
                     0.0,
                     1 if is_paid else 0,
                     1 if wants_delivery else 0,
                     0,
-                    0,  # DB trigger already enforces delivered rules
+                    0,  # delivered rules enforced by the orders CHECK constraint
                 ),
             )
-            conn.commit()
-        finally:
-            conn.close()
+        order_id = cur.lastrowid
+        bump_db_version()
 
         # Optional UX: auto-open the Add Items modal for this new order
         st.session_state["open_add_modal_for"] = order_id
@@ -140,116 +295,137 @@ def new_order_modal():
 
 
 # -----------------------------
-# Small UI helpers
+# DB logic helpers
 # -----------------------------
-def status_pill(label: str, value: bool) -> str:
-    bg = "#16a34a" if value else "#6b7280"
-    fg = "white"
-    text = "True" if value else "False"
-
-    return f"""
-    <span style="
-        display:inline-flex;
-        align-items:center;
-        padding:2px 10px;
-        border-radius:999px;
-        background:{bg};
-        color:{fg};
-        font-size:12px;
-        margin-right:8px;
-        white-space:nowrap;
-    ">
-      {label}: {text}
-    </span>
-    """
-
-def sync_packed_widget_state_from_db(order_id: str) -> None:
-    conn = get_conn()
+def get_session_conn():
+    """
+    One long-lived connection per browser session, reused across reruns (pragmas applied once).
+    Per session rather than per process so concurrent sessions never share a transaction.
+    Do not close it; it is closed when the session (and its session_state) goes away.
+    Writes use `with conn:` / conn.commit() for transactions.
+    """
+    conn = st.session_state.get("db_conn")
+    if conn is None:
+        conn = get_conn()
+        st.session_state["db_conn"] = conn
+    return conn
+
+
+@st.cache_resource
+def _db_version_counter() -> dict:
+    return {"version": 0, "file_stamp": None}
+
+
+def db_version() -> int:
+    """
+    Process-wide data version; cached loaders key on it so reruns without writes skip SQLite.
+    Also advances when the DB files change on disk, so writes made outside this process
+    (another server, the sqlite3 CLI) invalidate the cached reads too.
+    """
+    counter = _db_version_counter()
+    stamp = db_file_stamp()
+    if stamp != counter["file_stamp"]:
+        counter["file_stamp"] = stamp
+        counter["version"] += 1
+    return counter["version"]
+
+
+def bump_db_version() -> None:
+    """
+    Call after every write so load_orders / load_catalog / load_items re-query.
+    """
+    _db_version_counter()["version"] += 1
+
+
+@st.cache_data(show_spinner=False)
+def load_orders(version: int) -> pd.DataFrame:
+    """
+    All orders, newest first. Filters are applied in pandas (see Main: Filters);
+    customer search goes through the FTS index via search_order_ids.
+    """
+    return pd.read_sql_query(SQL_SELECT_ORDERS, get_session_conn())
+
+
+@st.cache_data(show_spinner=False)
+def search_order_ids(version: int, term: str) -> frozenset[int] | None:
+    """
+    order_ids whose customer contains term, via the orders_fts trigram index.
+    None when the index can't answer (term shorter than a trigram, or no FTS5 in this SQLite).
+    """
+    if len(term) < 3:
+        return None
+    phrase = '"' + term.replace('"', '""') + '"'
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT item_id, quantity, packed_quantity FROM items WHERE order_id = ?", (order_id,))
-        rows = cur.fetchall()
-        for r in rows:
-            item_id = r["item_id"]
-            qty = int(r["quantity"])
-            packed = int(r["packed_quantity"] or 0)
-            st.session_state[f"packed_{item_id}"] = min(packed, qty)
-            st.session_state[f"qty_{item_id}"] = qty
-    finally:
-        conn.close()
+        rows = get_session_conn().execute(SQL_SEARCH_ORDER_IDS, (phrase,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return frozenset(r["order_id"] for r in rows)
 
 
+@st.cache_data(show_spinner=False)
+def load_catalog(version: int) -> pd.DataFrame:
+    return pd.read_sql_query(SQL_SELECT_CATALOG, get_session_conn())
 
-# -----------------------------
-# DB logic helpers
-# -----------------------------
-def recompute_order_total(conn, order_id: str) -> None:
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(quantity * COALESCE(price, 0)), 0) AS total
-        FROM items
-        WHERE order_id = ?
-        """,
-        (order_id,),
-    )
-    total = float(cur.fetchone()["total"] or 0.0)
-    cur.execute("UPDATE orders SET total_dollar = ? WHERE order_id = ?", (total, order_id))
-    conn.commit()
 
+@st.cache_data(show_spinner=False)
+def load_catalog_prices(version: int) -> dict[str, float]:
+    catalog_df = load_catalog(version)
+    return dict(zip(catalog_df["item_name"], catalog_df["unit_price"].astype(float)))
 
 
-def recompute_order_fulfilled(conn, order_id: str) -> None:
+@st.cache_data(show_spinner=False)
+def load_items(version: int, order_id: int) -> list[dict]:
     """
-    Order fulfilled iff it has at least one item AND every item has packed_quantity >= quantity.
+    Items of one order as plain dicts. A handful of rows per order, so this skips
+    building a DataFrame; dicts (not sqlite3.Row) so st.cache_data can pickle them.
     """
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-          COUNT(*) AS total_items,
-          SUM(CASE WHEN packed_quantity >= quantity THEN 1 ELSE 0 END) AS fulfilled_items
-        FROM items
-        WHERE order_id = ?
-        """,
-        (order_id,),
-    )
-    row = cur.fetchone()
-    total_items = row["total_items"] or 0
-    fulfilled_items = row["fulfilled_items"] or 0
-    is_fulfilled = 1 if (total_items > 0 and fulfilled_items == total_items) else 0
-    cur.execute("UPDATE orders SET is_fulfilled = ? WHERE order_id = ?", (is_fulfilled, order_id))
-    conn.commit()
+    rows = get_session_conn().execute(SQL_SELECT_ORDER_ITEMS, (order_id,)).fetchall()
+    return [dict(r) for r in rows]
 
 
-def set_all_packed(conn, order_id: str, packed: bool) -> None:
+def set_all_packed(conn, order_id: int, packed: bool) -> None:
     cur = conn.cursor()
     if packed:
-        cur.execute("UPDATE items SET packed_quantity = quantity WHERE order_id = ?", (order_id,))
+        cur.execute(SQL_PACK_ALL_ITEMS, (order_id,))
     else:
-        cur.execute("UPDATE items SET packed_quantity = 0 WHERE order_id = ?", (order_id,))
+        cur.execute(SQL_UNPACK_ALL_ITEMS, (order_id,))
     conn.commit()
-    recompute_order_total(conn, order_id)
-    recompute_order_fulfilled(conn, order_id)
+    bump_db_version()
+
+
+def fill_missing_delivery_distances(conn) -> int:
+    """
+    Distances for delivery orders that have an address but no distance yet,
+    batched into Distance Matrix requests and written back with one executemany.
+    Returns how many orders were updated.
+    """
+    pending = conn.execute(SQL_SELECT_ORDERS_MISSING_DISTANCE).fetchall()
+    if not pending:
+        return 0
+
+    miles = compute_distances_miles_google([r["delivery_address"] for r in pending])
+    routed = [(r["order_id"], m) for r, m in zip(pending, miles) if m is not None]
+    if not routed:
+        return 0
+
+    order_ids, routed_miles = zip(*routed)
+    fees = delivery_fees_batch(routed_miles).tolist()
+    updates = list(zip(routed_miles, fees, order_ids))
+    with conn:
+        conn.executemany(SQL_UPDATE_ORDER_DISTANCE, updates)
+    bump_db_version()
+    return len(updates)
 
 
 def upsert_catalog(conn, catalog_df: pd.DataFrame) -> None:
     """
-    Upsert catalog item_name -> unit_price into DB.
+    Upsert catalog item_name -> unit_price into DB (one executemany; caller owns the transaction).
     """
-    cur = conn.cursor()
-    for _, r in catalog_df.iterrows():
-        name = str(r["item_name"]).strip()
-        price = float(r["unit_price"])
-        cur.execute(
-            """
-            INSERT INTO catalog(item_name, unit_price)
-            VALUES(?, ?)
-            ON CONFLICT(item_name) DO UPDATE SET unit_price=excluded.unit_price
-            """,
-            (name, price),
-        )
-    conn.commit()
+    rows = zip(
+        catalog_df["item_name"].astype(str).str.strip().tolist(),
+        catalog_df["unit_price"].astype(float).tolist(),
+    )
+    conn.executemany(SQL_UPSERT_CATALOG, rows)
 
 
 # -----------------------------
@@ -260,15 +436,12 @@ uploaded = st.sidebar.file_uploader("Upload Excel", type=["xlsx"])
 wipe_before = st.sidebar.checkbox("Wipe existing data before import", value=True)
 
 if st.sidebar.button("Import Excel", disabled=(uploaded is None)):
-    if wipe_before:
-        wipe_all()
-
     orders_df, items_df, checklist_df, catalog_df, issues_df = parse_orders_and_items(uploaded)
 
     # Rename to DB schema
     orders_df = orders_df.rename(
         columns={
-            "orderId": "order_id",
+            "orderId": "public_uuid",
             "totalDollar": "total_dollar",
             "isPaid": "is_paid",
             "wantsDelivery": "wants_delivery",
@@ -277,12 +450,15 @@ if st.sidebar.button("Import Excel", disabled=(uploaded is None)):
     )
     items_df = items_df.rename(
         columns={
-            "itemId": "item_id",
             "orderId": "order_id",
             "isChecked": "is_checked",
         }
     )
 
+    # total_dollar / is_fulfilled are rolled up from the inserted items by DB triggers
+    orders_df["total_dollar"] = 0.0
+    orders_df["is_fulfilled"] = False
+
     # Ensure delivered column exists (default 0)
     if "is_delivered" not in orders_df.columns:
         orders_df["is_delivered"] = 0
@@ -291,34 +467,46 @@ if st.sidebar.button("Import Excel", disabled=(uploaded is None)):
     if "packed_quantity" not in items_df.columns:
         items_df["packed_quantity"] = 0
 
-    # Booleans -> ints for sqlite
-    for c in ["is_paid", "wants_delivery", "is_fulfilled", "is_delivered"]:
-        orders_df[c] = orders_df[c].astype(bool).astype(int)
-    items_df["is_checked"] = items_df["is_checked"].astype(bool).astype(int)
+    # Booleans -> ints for sqlite: one 2-D cast for the whole flag block
+    # (uint8 view shares the bool buffer, 1 byte per flag instead of int64)
+    flag_cols = ["is_paid", "wants_delivery", "is_fulfilled", "is_delivered"]
+    orders_df[flag_cols] = orders_df[flag_cols].fillna(False).to_numpy(dtype=bool).view(np.uint8)
+    items_df["is_checked"] = items_df["is_checked"].fillna(False).to_numpy(dtype=bool).view(np.uint8)
 
-    conn = get_conn()
+    conn = get_session_conn()
 
-    # Upsert catalog
-    # Your catalog_df from parser contains columns ["item_name","unit_price",...]
-    if not catalog_df.empty and "item_name" in catalog_df.columns and "unit_price" in catalog_df.columns:
-        upsert_catalog(conn, catalog_df[["item_name", "unit_price"]])
+    # Wipe + catalog + orders + items in one transaction (bulk executemany, single commit)
+    # Import is re-runnable from the workbook, so skip fsyncs while loading
+    with bulk_write_pragmas(conn):
+        try:
+            conn.execute("BEGIN")
 
-    # Insert orders/items
-    orders_df[["order_id", "customer", "total_dollar", "is_paid", "wants_delivery", "is_fulfilled", "is_delivered"]].to_sql(
-        "orders", conn, if_exists="append", index=False
-    )
-    items_df[["item_id", "order_id", "name", "quantity", "price", "is_checked", "packed_quantity"]].to_sql(
-        "items", conn, if_exists="append", index=False
-    )
+            if wipe_before:
+                delete_all_rows(conn)
+
+            # Upsert catalog
+            # Your catalog_df from parser contains columns ["item_name","unit_price",...]
+            if not catalog_df.empty and "item_name" in catalog_df.columns and "unit_price" in catalog_df.columns:
+                upsert_catalog(conn, catalog_df[["item_name", "unit_price"]])
 
-    # Recompute totals + fulfillment after import (in case)
-    for oid in orders_df["order_id"].tolist():
-        recompute_order_total(conn, oid)
-        recompute_order_fulfilled(conn, oid)
+            # Items are re-pointed from the parser's uuids to the new integer order_ids
+            bulk_insert_orders(conn, orders_df, items_df)
 
-    conn.close()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            bump_db_version()
 
     st.sidebar.success(f"Imported {len(orders_df)} orders, {len(items_df)} items.")
+
+    try:
+        filled = fill_missing_delivery_distances(conn)
+        if filled:
+            st.sidebar.info(f"Computed delivery distance for {filled} orders.")
+    except (RuntimeError, requests.RequestException) as e:
+        st.sidebar.warning(f"Delivery distances not computed: {e}")
     if not issues_df.empty:
         st.sidebar.warning(f"Parsing warnings: {len(issues_df)}")
 
@@ -326,7 +514,7 @@ if st.sidebar.button("Import Excel", disabled=(uploaded is None)):
 # -----------------------------
 # Main: Filters
 # -----------------------------
-conn = get_conn()
+conn = get_session_conn()
 
 colA, colB, colC, colD = st.columns([2, 1, 1, 1])
 search = colA.text_input("Search customer", value="")
@@ -334,21 +522,24 @@ filter_unfulfilled = colB.checkbox("Only unfulfilled", value=False)
 filter_delivery = colC.checkbox("Only wants delivery", value=False)
 filter_undelivered = colD.checkbox("Only undelivered", value=False)
 
-query = "SELECT * FROM orders WHERE 1=1"
-params = []
+orders_all = load_orders(db_version())
 
-if search.strip():
-    query += " AND customer LIKE ?"
-    params.append(f"%{search.strip()}%")
+mask = np.ones(len(orders_all), dtype=bool)
+term = search.strip()
+if term:
+    matched_ids = search_order_ids(db_version(), term)
+    if matched_ids is not None:
+        mask &= orders_all["order_id"].isin(matched_ids).to_numpy()
+    else:
+        mask &= orders_all["customer"].str.contains(term, case=False, regex=False, na=False).to_numpy()
 if filter_unfulfilled:
-    query += " AND is_fulfilled = 0"
+    mask &= (orders_all["is_fulfilled"] == 0).to_numpy()
 if filter_delivery:
-    query += " AND wants_delivery = 1"
+    mask &= (orders_all["wants_delivery"] == 1).to_numpy()
 if filter_undelivered:
-    query += " AND is_delivered = 0"
+    mask &= (orders_all["is_delivered"] == 0).to_numpy()
 
-query += " ORDER BY created_at DESC"
-orders = pd.read_sql_query(query, conn, params=params)
+orders = orders_all[mask]
 
 top1, top2 = st.columns([1, 5])
 if top1.button("➕ New order"):
@@ -356,28 +547,19 @@ if top1.button("➕ New order"):
 
 
 # --- Batch / View totals (sum of currently displayed orders) ---
-items_total = float(
-    pd.to_numeric(orders["total_dollar"], errors="coerce")
-      .fillna(0.0)
-      .sum()
+# Orders are already in memory (cached + filtered), so one float matrix and column sums
+# beat another SQLite round trip; NULLs count as 0.
+money = orders[["total_dollar", "delivery_fee", "amount_received", "change_given"]].to_numpy(
+    dtype=float, na_value=0.0
 )
+items_total = float(money[:, 0].sum())
+delivery_total = float(money[:, 1].sum())
 
-delivery_total = float(
-    pd.to_numeric(orders["delivery_fee"], errors="coerce")
-      .fillna(0.0)
-      .sum()
-)
-
-# Calculate total received and changes owed
-total_received = 0.0
-changes_owed = 0.0
-for _, o in orders.iterrows():
-    amount_recv = float(o.get("amount_received") or 0.0)
-    if amount_recv > 0.01:
-        total_received += amount_recv
-    change_owed = float(o.get("change_given") or 0.0)
-    if change_owed > 0.01:
-        changes_owed += change_owed
+# Calculate total received and changes owed (ignore sub-cent noise)
+received = money[:, 2]
+change_given = money[:, 3]
+total_received = float(received[received > 0.01].sum())
+changes_owed = float(change_given[change_given > 0.01].sum())
 
 grand_total = items_total + delivery_total
 
@@ -398,52 +580,42 @@ st.divider()
 st.caption(f"Showing {len(orders)} orders")
 
 
-# Load catalog once for add-item UI
-
-catalog = pd.read_sql_query("SELECT item_name, unit_price FROM catalog ORDER BY item_name ASC", conn)
-catalog_names = catalog["item_name"].tolist()
 
 
-
-def add_item_to_order(order_id: str, item_name: str, qty_to_add: int, unit_price: float) -> None:
+def add_item_to_order(order_id: int, item_name: str, qty_to_add: int, unit_price: float) -> None:
     """
     If (order_id, name) exists -> increment quantity; else insert.
-    Opens its own DB connection to avoid 'closed database' issues on reruns.
+    Single UPSERT, no lookup round-trip first.
+    Uses the shared connection (never closed between reruns).
     """
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT item_id, quantity, packed_quantity FROM items WHERE order_id = ? AND name = ?",
-            (order_id, item_name),
+    conn = get_session_conn()
+    with conn:
+        conn.execute(
+            SQL_ADD_ITEM_TO_ORDER,
+            (order_id, item_name, int(qty_to_add), float(unit_price)),
         )
-        existing = cur.fetchone()
-
-        if existing:
-            new_qty = int(existing["quantity"]) + int(qty_to_add)
-            new_packed = min(int(existing["packed_quantity"]), new_qty)
-            cur.execute(
-                """
-                UPDATE items
-                SET quantity = ?, price = ?, packed_quantity = ?
-                WHERE item_id = ?
-                """,
-                (new_qty, float(unit_price), new_packed, existing["item_id"]),
-            )
-        else:
-            cur.execute(
-                """
-                INSERT INTO items(item_id, order_id, name, quantity, price, is_checked, packed_quantity)
-                VALUES(?, ?, ?, ?, ?, 0, 0)
-                """,
-                (str(uuid.uuid4()), order_id, item_name, int(qty_to_add), float(unit_price)),
-            )
 
-        conn.commit()
-        recompute_order_total(conn, order_id)
-        recompute_order_fulfilled(conn, order_id)
-    finally:
-        conn.close()
+    bump_db_version()
+
+
+def apply_item_edits(conn, edited: pd.DataFrame) -> None:
+    """
+    Changed rows from the items editor (indexed by item_id) in one transaction:
+    removals as one executemany DELETE, qty / packed edits as one executemany UPDATE.
+    The rollup triggers refresh the order inside the same statements, so one commit total.
+    """
+    removed = edited["remove"].to_numpy(dtype=bool)
+    kept = edited[~removed]
+
+    qty = kept["quantity"].astype(int).clip(lower=1)
+    packed = np.minimum(kept["packed_quantity"].astype(int).clip(lower=0), qty)
+
+    deletes = [(item_id,) for item_id in edited.index[removed].tolist()]
+    updates = list(zip(qty.tolist(), packed.tolist(), kept.index.tolist()))
+    with conn:
+        conn.executemany(SQL_DELETE_ITEM, deletes)
+        conn.executemany(SQL_UPDATE_ITEM_QTY, updates)
+    bump_db_version()
 
 
 
@@ -460,7 +632,7 @@ if "active_modal_order_id" not in st.session_state:
     st.session_state["active_modal_order_id"] = None
 
 
-def open_modal(modal_name: str, order_id: str):
+def open_modal(modal_name: str, order_id: int):
     st.session_state["active_modal"] = modal_name
     st.session_state["active_modal_order_id"] = order_id
     st.rerun()
@@ -475,10 +647,14 @@ def close_modal():
 @st.dialog("Add items")
 def add_items_modal():
     order_id = st.session_state.get("active_modal_order_id")
-    if not order_id:
+    if order_id is None:
         close_modal()
 
-    if catalog.empty:
+    # Catalog is only needed here, so it is loaded when the dialog opens (not every rerun)
+    catalog_price = load_catalog_prices(db_version())
+    catalog_names = list(catalog_price)  # load_catalog orders by item_name
+
+    if not catalog_names:
         st.warning("No catalog loaded. Import an Excel file to load the product catalog.")
         if st.button("Close"):
             close_modal()
@@ -489,49 +665,42 @@ def add_items_modal():
     sel_key = f"modal_sel_{order_id}"
     qty_key = f"modal_qty_{order_id}"
     price_key = f"modal_price_{order_id}"
-    last_sel_key = f"modal_last_sel_{order_id}"
 
-    selected = st.selectbox("Item", options=catalog_names, key=sel_key)
-    default_price = float(catalog.loc[catalog["item_name"] == selected, "unit_price"].iloc[0])
+    def reset_price_to_catalog() -> None:
+        st.session_state[price_key] = float(catalog_price[st.session_state[sel_key]])
 
-    if last_sel_key not in st.session_state:
-        st.session_state[last_sel_key] = selected
-    if st.session_state[last_sel_key] != selected:
-        st.session_state[price_key] = default_price
-        st.session_state[last_sel_key] = selected
-    else:
-        if price_key not in st.session_state:
-            st.session_state[price_key] = default_price
+    # Picking an item is the only pre-submit rerun: it re-defaults the unit price
+    selected = st.selectbox("Item", options=catalog_names, key=sel_key, on_change=reset_price_to_catalog)
+    if price_key not in st.session_state:
+        st.session_state[price_key] = float(catalog_price[selected])
 
-    qty_to_add = st.number_input("Qty to add", min_value=1, step=1, value=1, key=qty_key)
-    unit_price = st.number_input("Unit price", min_value=0.0, step=0.5, key=price_key)
+    # Qty / price edits are batched into one rerun on submit
+    with st.form(f"add_items_form_{order_id}", border=False):
+        qty_to_add = st.number_input("Qty to add", min_value=1, step=1, value=1, key=qty_key)
+        unit_price = st.number_input("Unit price", min_value=0.0, step=0.5, key=price_key)
 
-    c1, c2 = st.columns([1, 1])
-    if c1.button("Add", type="primary"):
+        c1, c2 = st.columns([1, 1])
+        submitted = c1.form_submit_button("Add", type="primary")
+        cancelled = c2.form_submit_button("Cancel")
+
+    if submitted:
         add_item_to_order(order_id, selected, int(qty_to_add), float(unit_price))
-        try:
-            sync_packed_widget_state_from_db(order_id)
-        except Exception:
-            pass
         close_modal()
 
-    if c2.button("Cancel"):
+    if cancelled:
         close_modal()
 
 
 @st.dialog("Remove order")
 def confirm_delete_order_modal():
     order_id = st.session_state.get("active_modal_order_id")
-    if not order_id:
+    if order_id is None:
         close_modal()
 
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT customer, total_dollar FROM orders WHERE order_id = ?", (order_id,))
-        row = cur.fetchone()
-    finally:
-        conn.close()
+    conn = get_session_conn()
+    cur = conn.cursor()
+    cur.execute(SQL_SELECT_ORDER_HEADER, (order_id,))
+    row = cur.fetchone()
 
     if not row:
         st.warning("Order no longer exists.")
@@ -550,18 +719,11 @@ def confirm_delete_order_modal():
 
     c1, c2 = st.columns(2)
     if c1.button("Yes, remove", type="primary"):
-        conn = get_conn()
-        try:
-            cur = conn.cursor()
-            cur.execute("BEGIN")
-            cur.execute("DELETE FROM items WHERE order_id = ?", (order_id,))
-            cur.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        conn = get_session_conn()
+        with conn:
+            conn.execute(SQL_DELETE_ORDER_ITEMS, (order_id,))
+            conn.execute(SQL_DELETE_ORDER, (order_id,))
+        bump_db_version()
 
         close_modal()
 
@@ -577,36 +739,144 @@ elif st.session_state.get("active_modal") == "add_items":
 
 
 # -----------------------------
-# Render orders list (row itself expandable + divider between orders)
+# Render orders list (one editable table; item widgets only for the open order)
 # -----------------------------
+# Status is shown as emoji text; no per-pill HTML for the browser to parse
+STATUS_LABELS = ("Paid", "Delivery", "Fulfilled", "Delivered", "Handed off")
+
+
 def status_text(label: str, value: bool) -> str:
     return f"🟢 {label}" if value else f"⚪ {label}"
 
 
+_STATUS_TEXT = {(label, value): status_text(label, value) for label in STATUS_LABELS for value in (True, False)}
+
+
+ORDER_FLAG_COLUMNS = ["is_paid", "wants_delivery", "is_fulfilled", "is_delivered", "is_handed_off"]
+ORDER_EDITABLE_FLAGS = ["is_paid", "is_delivered", "is_handed_off"]
+
+orders_view = orders.set_index("order_id")[["customer", "total_dollar", "delivery_fee", *ORDER_FLAG_COLUMNS]].copy()
+for c in ORDER_FLAG_COLUMNS:
+    orders_view[c] = orders_view[c].fillna(0).astype(bool)
+
+editor_warning = st.session_state.pop("orders_editor_warning", None)
+if editor_warning:
+    st.warning(editor_warning)
+
+# Keyed on a revision so the editor resets to DB state after each applied (or rejected) edit
+editor_rev = st.session_state.get("orders_editor_rev", 0)
+edited = st.data_editor(
+    orders_view,
+    key=f"orders_editor_{editor_rev}",
+    hide_index=True,
+    disabled=["customer", "total_dollar", "delivery_fee", "wants_delivery", "is_fulfilled"],
+    column_config={
+        "customer": st.column_config.TextColumn("Customer"),
+        "total_dollar": st.column_config.NumberColumn("Items", format="$%.2f"),
+        "delivery_fee": st.column_config.NumberColumn("Delivery fee", format="$%.2f"),
+        "is_paid": st.column_config.CheckboxColumn("Paid"),
+        "wants_delivery": st.column_config.CheckboxColumn("Delivery"),
+        "is_fulfilled": st.column_config.CheckboxColumn("Fulfilled"),
+        "is_delivered": st.column_config.CheckboxColumn("Delivered"),
+        "is_handed_off": st.column_config.CheckboxColumn("Handed off"),
+    },
+)
 
-for _, o in orders.iterrows():
-    order_id = o["order_id"]
-    customer = o["customer"]
-    total = o["total_dollar"]
+# Diff the editor against the DB view and write every changed row in one executemany
+changed = (edited[ORDER_EDITABLE_FLAGS] != orders_view[ORDER_EDITABLE_FLAGS]).any(axis=1)
+if changed.any():
+    updates = []
+    rejected = []
+    # Plain dict records (one C pass each) instead of a pandas Series per row
+    before_rows = orders_view[changed].to_dict("index")
+    for order_id, row in edited.loc[changed, ORDER_EDITABLE_FLAGS].to_dict("index").items():
+        before = before_rows[order_id]
+        delivered = bool(row["is_delivered"])
+        handed_off = bool(row["is_handed_off"])
+
+        # Guardrail: only deliver / hand off once fulfilled (and only on the matching order type)
+        if delivered and not before["is_delivered"] and not (before["wants_delivery"] and before["is_fulfilled"]):
+            delivered = False
+            rejected.append(f"{before['customer']}: only fulfilled delivery orders can be marked delivered.")
+        if handed_off and not before["is_handed_off"] and (before["wants_delivery"] or not before["is_fulfilled"]):
+            handed_off = False
+            rejected.append(f"{before['customer']}: only fulfilled pickup orders can be marked handed off.")
+
+        updates.append((int(bool(row["is_paid"])), int(delivered), int(handed_off), int(order_id)))
+
+    with conn:
+        conn.executemany(SQL_UPDATE_ORDER_FLAGS, updates)
+    bump_db_version()
+
+    st.session_state["orders_editor_rev"] = editor_rev + 1
+    if rejected:
+        st.session_state["orders_editor_warning"] = "\n\n".join(rejected)
+    st.rerun()
 
-    paid = bool(o["is_paid"])
-    wants_delivery = bool(o["wants_delivery"])
-    fulfilled = bool(o["is_fulfilled"])
-    delivered = bool(o.get("is_delivered", 0))
 
-    total_display = f"${float(total):.2f}" if pd.notna(total) else "—"
+# Single "open" order: only this one builds per-item widgets
+order_labels = {
+    oid: f"{cust} | Items: ${float(total or 0.0):,.2f}"
+    for oid, cust, total in zip(orders["order_id"], orders["customer"], orders["total_dollar"])
+}
+if st.session_state.get("expanded_order_id") not in order_labels:
+    st.session_state["expanded_order_id"] = None
+
+open_order_id = st.selectbox(
+    "Open order",
+    options=list(order_labels),
+    format_func=order_labels.get,
+    index=None,
+    placeholder="Select an order to pack / edit items",
+    key="expanded_order_id",
+)
+
+
+# Columns of the packing-checklist editor that the user can change
+ITEM_EDITABLE_COLUMNS = ["quantity", "packed_quantity", "remove"]
+
+# Order-level values shown outside the order fragment (table + batch totals)
+ORDER_SUMMARY_COLUMNS = ["total_dollar", "is_fulfilled", "delivery_fee", "amount_received", "change_given"]
+
+
+def load_order_row(order_id: int) -> pd.Series | None:
+    current = load_orders(db_version())
+    match = current.loc[current["order_id"] == order_id]
+    return match.iloc[0] if not match.empty else None
+
+
+def rerun_after_order_write(order_id: int, before: pd.Series) -> None:
+    """
+    Rerun only the order fragment unless the write changed something rendered outside it.
+    """
+    after = load_order_row(order_id)
+    if after is None or not after[ORDER_SUMMARY_COLUMNS].equals(before[ORDER_SUMMARY_COLUMNS]):
+        st.rerun()
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Fragment body executed as part of a full-app run: scope="fragment" is not allowed there
+        st.rerun()
+
+
+@st.fragment
+def render_order(order_id: int) -> None:
+    o = load_order_row(order_id)
+    if o is None:
+        st.info("Order no longer exists.")
+        return
 
     # -----------------------------
-    # Header block (cleaned + robust)
+    # Header row for the selected order (this fragment renders just that one order)
     # -----------------------------
-
-    order_id = o["order_id"]
+    order_id = int(o["order_id"])
     customer = o["customer"]
 
     paid = bool(o.get("is_paid", 0))
     wants_delivery = bool(o.get("wants_delivery", 0))
     fulfilled = bool(o.get("is_fulfilled", 0))
     delivered = bool(o.get("is_delivered", 0))
+    handed_off = bool(o.get("is_handed_off", 0))
 
     # Totals: items total is orders.total_dollar; delivery fee stored separately
     items_total = float(o.get("total_dollar") or 0.0)
@@ -621,18 +891,6 @@ for _, o in orders.iterrows():
 
     has_delivery_calc = wants_delivery and d_addr != "" and (delivery_fee is not None) and (delivery_miles is not None) and delivery_miles > 0
 
-    
-    # Expander label (replace the existing header_label block)
-    items_total = float(o.get("total_dollar") or 0.0)
-    d_addr = (o.get("delivery_address") or "").strip()
-    d_fee_raw = o.get("delivery_fee", None)
-    d_miles_raw = o.get("delivery_distance_miles", None)
-
-    delivery_fee = float(d_fee_raw) if (wants_delivery and pd.notna(d_fee_raw)) else None
-    delivery_miles = float(d_miles_raw) if (wants_delivery and pd.notna(d_miles_raw)) else None
-
-    has_delivery_calc = wants_delivery and d_addr != "" and (delivery_fee is not None) and (delivery_miles is not None) and delivery_miles > 0
-
     if wants_delivery:
         if has_delivery_calc:
             grand_total = items_total + delivery_fee
@@ -646,30 +904,23 @@ for _, o in orders.iterrows():
         header_label = f"{customer} | Items: ${items_total:,.2f}"
 
 
-
     # Row layout: left = name, mid = status pills, right = action icons
     h_left, h_mid, h_right = st.columns([3, 2, 0.6])
 
-    h_left.markdown(f"**{customer}**")
-
-    # Status pills (replace existing status pills block)
-    paid = bool(o.get("is_paid", 0))
-    fulfilled = bool(o.get("is_fulfilled", 0))
-    delivered = bool(o.get("is_delivered", 0))
-    handed_off = bool(o.get("is_handed_off", 0))
+    h_left.markdown(f"**{header_label}**")
 
     if wants_delivery:
         s1, s2, s3, s4 = h_mid.columns(4)
-        s1.markdown(status_text("Paid", paid))
-        s2.markdown(status_text("Delivery", True))
-        s3.markdown(status_text("Fulfilled", fulfilled))
-        s4.markdown(status_text("Delivered", delivered))
+        s1.markdown(_STATUS_TEXT["Paid", paid])
+        s2.markdown(_STATUS_TEXT["Delivery", True])
+        s3.markdown(_STATUS_TEXT["Fulfilled", fulfilled])
+        s4.markdown(_STATUS_TEXT["Delivered", delivered])
     else:
         s1, s2, s3, s4 = h_mid.columns(4)
-        s1.markdown(status_text("Paid", paid))
-        s2.markdown(status_text("Delivery", False))
-        s3.markdown(status_text("Fulfilled", fulfilled))
-        s4.markdown(status_text("Handed off", handed_off))
+        s1.markdown(_STATUS_TEXT["Paid", paid])
+        s2.markdown(_STATUS_TEXT["Delivery", False])
+        s3.markdown(_STATUS_TEXT["Fulfilled", fulfilled])
+        s4.markdown(_STATUS_TEXT["Handed off", handed_off])
 
 
     # Action icons (two buttons side-by-side)
@@ -680,201 +931,88 @@ for _, o in orders.iterrows():
         open_modal("delete_order", order_id)
 
 
-    # The row itself is expandable (no separate button)
-    with st.expander(header_label, expanded=False):
+    with st.container(border=True):
 
         # -------------------------
-        # Expanded Order Content (Top actions + toggles)
+        # Top actions (Paid / Delivered / Handed off are edited in the table above)
         # -------------------------
-        a1, a2, a3 = st.columns([1, 1, 3])
+        a1, a2, _ = st.columns([1, 1, 3])
 
         if a1.button("Mark all packed", key=f"pack_all_{order_id}"):
             set_all_packed(conn, order_id, True)
-            sync_packed_widget_state_from_db(order_id)
-            st.rerun()
+            rerun_after_order_write(order_id, o)
 
         if a2.button("Clear packed", key=f"clear_pack_{order_id}"):
             set_all_packed(conn, order_id, False)
-            sync_packed_widget_state_from_db(order_id)
-            st.rerun()
-
-
-        # Paid toggle always; Delivered toggle only for delivery orders (pickup gets handoff checkbox)
-        if wants_delivery:
-            t_paid, t_delivered, _ = a3.columns([1, 1, 2])
-        else:
-            t_paid, t_handoff, _ = a3.columns([1, 1, 2])
+            rerun_after_order_write(order_id, o)
 
-        new_paid = t_paid.checkbox("Paid", value=paid, key=f"paid_ctrl_{order_id}")
-        if int(new_paid) != int(paid):
-            cur = conn.cursor()
-            cur.execute("UPDATE orders SET is_paid = ? WHERE order_id = ?", (1 if new_paid else 0, order_id))
-            conn.commit()
-            st.rerun()
-
-        # Delivery / Handed off logic (use distinct keys)
-        if wants_delivery:
-            delivered_disabled = not fulfilled
-            new_delivered = t_delivered.checkbox(
-                "Delivered",
-                value=delivered,
-                disabled=delivered_disabled,
-                key=f"delivered_ctrl_{order_id}",
-            )
-            if int(new_delivered) != int(delivered):
-                cur = conn.cursor()
-                cur.execute("UPDATE orders SET is_delivered = ? WHERE order_id = ?", (1 if new_delivered else 0, order_id))
-                conn.commit()
-                st.rerun()
-        else:
-            handed_disabled = not fulfilled
-            new_handed = t_handoff.checkbox(
-                "Handed off",
-                value=handed_off,
-                disabled=handed_disabled,
-                key=f"handed_ctrl_{order_id}",
-            )
-            if int(new_handed) != int(handed_off):
-                cur = conn.cursor()
-                cur.execute("UPDATE orders SET is_handed_off = ? WHERE order_id = ?", (1 if new_handed else 0, order_id))
-                conn.commit()
-                st.rerun()
-
-            
-        
-
-
-        if wants_delivery:
-            delivered_disabled = not fulfilled  # your guardrail: only deliver if fulfilled
-            new_delivered = t_delivered.checkbox(
-                "Delivered",
-                value=delivered,
-                disabled=delivered_disabled,
-                key=f"delivered_ctrl_expander_{order_id}",  # made unique
-            )
-            if int(new_delivered) != int(delivered):
-                cur = conn.cursor()
-                cur.execute("UPDATE orders SET is_delivered = ? WHERE order_id = ?", (1 if new_delivered else 0, order_id))
-                conn.commit()
-                st.rerun()
-
-        
 
         # -------------------------
         # Packing Checklist
         # -------------------------
         st.subheader("Packing Checklist")
 
-        items = pd.read_sql_query(
-            "SELECT * FROM items WHERE order_id = ? ORDER BY name ASC",
-            conn,
-            params=(order_id,),
-        )
+        items = load_items(db_version(), order_id)
 
-        if items.empty:
+        if not items:
             st.info("No items on this order yet.")
         else:
-            for _, it in items.iterrows():
-                item_id = it["item_id"]
-                name = it["name"]
-                qty = int(it["quantity"])
-                price = it["price"]
-                packed_qty = int(it["packed_quantity"]) if pd.notna(it["packed_quantity"]) else 0
-
-                is_done = packed_qty >= qty
-                status = "✅" if is_done else "⬜"
-                price_display = f"${float(price):.2f}" if pd.notna(price) else "—"
-
-                r1, r2, r3, r4 = st.columns([5, 2, 2, 1])
-
-                r1.write(f"{status} {name}  | ordered: {qty}  | unit: {price_display}")
-
-                new_packed = r2.number_input(
-                    "Packed",
-                    min_value=0,
-                    max_value=qty,
-                    value=min(packed_qty, qty),
-                    step=1,
-                    key=f"packed_{item_id}",
-                )
-
-                new_qty = r3.number_input(
-                    "Ordered",
-                    min_value=1,
-                    value=qty,
-                    step=1,
-                    key=f"qty_{item_id}",
-                )
+            items_view = pd.DataFrame(items).set_index("item_id")
+            items_view["status"] = np.where(items_view["packed_quantity"] >= items_view["quantity"], "✅", "⬜")
+            items_view["remove"] = False
+
+            # One table widget instead of 4 widgets per item. Keyed on the data version so
+            # it resets to DB state after every write (its own, Mark all packed, Add items).
+            edited_items = st.data_editor(
+                items_view[["status", "name", "price", *ITEM_EDITABLE_COLUMNS]],
+                key=f"items_editor_{order_id}_{db_version()}",
+                hide_index=True,
+                num_rows="fixed",
+                disabled=["status", "name", "price"],
+                column_config={
+                    "status": st.column_config.TextColumn("", width="small"),
+                    "name": st.column_config.TextColumn("Item"),
+                    "price": st.column_config.NumberColumn("Unit", format="$%.2f"),
+                    "quantity": st.column_config.NumberColumn("Ordered", min_value=1, step=1),
+                    "packed_quantity": st.column_config.NumberColumn("Packed", min_value=0, step=1),
+                    "remove": st.column_config.CheckboxColumn("Remove"),
+                },
+            )
 
-                if r4.button("Remove", key=f"rm_{item_id}"):
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
-                    conn.commit()
-                    recompute_order_total(conn, order_id)
-                    recompute_order_fulfilled(conn, order_id)
-                    st.rerun()
-
-                if int(new_packed) != packed_qty:
-                    cur = conn.cursor()
-                    cur.execute("UPDATE items SET packed_quantity = ? WHERE item_id = ?", (int(new_packed), item_id))
-                    conn.commit()
-                    recompute_order_total(conn, order_id)
-                    recompute_order_fulfilled(conn, order_id)
-                    st.rerun()
-
-                if int(new_qty) != qty:
-                    cur = conn.cursor()
-                    clamped_packed = min(packed_qty, int(new_qty))
-                    cur.execute(
-                        "UPDATE items SET quantity = ?, packed_quantity = ? WHERE item_id = ?",
-                        (int(new_qty), int(clamped_packed), item_id),
-                    )
-                    conn.commit()
-                    recompute_order_total(conn, order_id)
-                    recompute_order_fulfilled(conn, order_id)
-                    st.rerun()
+            # Cleared cells fall back to the stored value; then diff against the DB view
+            edited_items[ITEM_EDITABLE_COLUMNS] = edited_items[ITEM_EDITABLE_COLUMNS].fillna(
+                items_view[ITEM_EDITABLE_COLUMNS]
+            )
+            changed = (edited_items[ITEM_EDITABLE_COLUMNS] != items_view[ITEM_EDITABLE_COLUMNS]).any(axis=1)
+            if changed.any():
+                apply_item_edits(conn, edited_items[changed])
+                rerun_after_order_write(order_id, o)
 
 
         # -------------------------
-        # Delivery Section (INSIDE expander, UNIQUE keys, compute-once)
+        # Delivery Section (inside the order's bordered container, keys per order_id)
         # -------------------------
         if wants_delivery:
             st.subheader("Delivery")
 
-            # Load stored values
-            conn2 = get_conn()
-            try:
-                cur2 = conn2.cursor()
-                cur2.execute(
-                    """
-                    SELECT delivery_address,
-                        delivery_distance_miles,
-                        delivery_fee,
-                        delivery_distance_computed_at
-                    FROM orders
-                    WHERE order_id = ?
-                    """,
-                    (order_id,),
+            # Stored values come from the already-loaded order row (no extra SELECT)
+            existing_address = d_addr
+            existing_miles = delivery_miles
+            existing_fee = delivery_fee
+
+            # Address edits only rerun on submit (form), not on every blur / Enter
+            with st.form(f"delivery_form_{order_id}", border=False):
+                # Use value=existing_address (no session_state prefill needed) and scoped keys
+                new_address = st.text_input(
+                    "Delivery address",
+                    value=existing_address,
+                    key=f"delivery_addr_expander_{order_id}",
+                    placeholder="Street, City, CA ZIP",
                 )
-                row = cur2.fetchone()
-            finally:
-                conn2.close()
-
-            existing_address = (row["delivery_address"] if row and row["delivery_address"] else "") or ""
-            existing_miles = row["delivery_distance_miles"] if row else None
-            existing_fee = row["delivery_fee"] if row else None
-
-            # Use value=existing_address (no session_state prefill needed) and scoped keys
-            new_address = st.text_input(
-                "Delivery address",
-                value=existing_address,
-                key=f"delivery_addr_expander_{order_id}",
-                placeholder="Street, City, CA ZIP",
-            )
 
-            colA, colB = st.columns([1, 1])
-            calc_clicked = colA.button("Calculate delivery fee", key=f"calc_fee_expander_{order_id}")
-            recalc_clicked = colB.button("Recalculate", key=f"recalc_fee_expander_{order_id}")
+                colA, colB = st.columns([1, 1])
+                calc_clicked = colA.form_submit_button("Calculate delivery fee")
+                recalc_clicked = colB.form_submit_button("Recalculate")
 
             # Compute-once rule:
             # Only call Google if wants_delivery=1 AND address non-empty AND
@@ -897,27 +1035,15 @@ for _, o in orders.iterrows():
                     miles = compute_distance_miles_google(new_address.strip())
                     fee = delivery_fee_from_miles(miles)
 
-                    conn3 = get_conn()
-                    try:
-                        cur3 = conn3.cursor()
-                        cur3.execute(
-                            """
-                            UPDATE orders
-                            SET delivery_address = ?,
-                                delivery_distance_miles = ?,
-                                delivery_fee = ?,
-                                delivery_distance_computed_at = datetime('now'),
-                                delivery_distance_source = 'google'
-                            WHERE order_id = ?
-                            """,
+                    with conn:
+                        conn.execute(
+                            SQL_SAVE_ORDER_DELIVERY,
                             (new_address.strip(), float(miles), float(fee), order_id),
                         )
-                        conn3.commit()
-                    finally:
-                        conn3.close()
+                    bump_db_version()
 
                     st.success(f"Saved: {miles:.2f} miles → ${fee:.2f}")
-                    st.rerun()
+                    rerun_after_order_write(order_id, o)
 
             # Display stored results (NO API calls)
             if existing_address.strip():
@@ -934,23 +1060,9 @@ for _, o in orders.iterrows():
         # -------------------------
         st.subheader("Payment")
         
-        # Load stored values
-        conn_pay = get_conn()
-        try:
-            cur_pay = conn_pay.cursor()
-            cur_pay.execute(
-                """
-                SELECT amount_received, change_given
-                FROM orders
-                WHERE order_id = ?
-                """,
-                (order_id,),
-            )
-            payment_row = cur_pay.fetchone()
-        finally:
-            conn_pay.close()
-
-        existing_amount_received = float(payment_row["amount_received"] or 0.0) if payment_row else 0.0
+        # Stored value comes from the already-loaded order row (no extra SELECT)
+        amount_received_raw = o.get("amount_received", None)
+        existing_amount_received = float(amount_received_raw) if pd.notna(amount_received_raw) else 0.0
         
         # Calculate total due (items + delivery)
         total_due = items_total
@@ -975,27 +1087,18 @@ for _, o in orders.iterrows():
 
         # Save amount received if changed
         if abs(new_amount_received - existing_amount_received) > 0.001:
-            conn_upd = get_conn()
-            try:
-                cur_upd = conn_upd.cursor()
-                cur_upd.execute(
-                    """
-                    UPDATE orders
-                    SET amount_received = ?, change_given = ?
-                    WHERE order_id = ?
-                    """,
+            with conn:
+                conn.execute(
+                    SQL_SAVE_ORDER_PAYMENT,
                     (float(new_amount_received), auto_change, order_id),
                 )
-                conn_upd.commit()
-            finally:
-                conn_upd.close()
-            st.rerun()
+            bump_db_version()
+            rerun_after_order_write(order_id, o)
 
         
 
         st.divider()
-           
-    st.divider()
 
-    
-conn.close()
+
+if open_order_id is not None:
+    render_order(open_order_id)
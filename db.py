@@ -1,24 +1,142 @@
 # db.py (FULL REPLACEMENT)
+import atexit
 import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
 
 DB_PATH = Path("data/orders.db")
 
+# Applied to every new connection:
+#   WAL + NORMAL sync -> commits no longer fsync the main DB file each time
+#   (journal_mode persists in the file; re-issuing it on an already-WAL db is a no-op)
+#   busy_timeout -> wait up to 5s for another session's write lock instead of "database is locked"
+#   temp_store / cache_size / mmap_size -> keep sorts, temp b-trees and hot pages in memory
+CONNECTION_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA busy_timeout=5000;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA mmap_size=268435456;
+PRAGMA foreign_keys=ON;
+"""
+
+
+# PRAGMA user_version of the current schema; bump when init_db gains a one-time migration
+# or the rollup trigger definitions change (a current database skips both on startup).
+#   1: orders carries CHECK (is_delivered = 0 OR wants_delivery = 1)
+#   2: items deduped on (order_id, name_norm)
+SCHEMA_VERSION = 2
+
+# delivered only makes sense for delivery orders; evaluated inline by SQLite on every write
+ORDERS_DELIVERED_CHECK = "CHECK (is_delivered = 0 OR wants_delivery = 1)"
+
+# items.name with tab / CR / LF / no-break / full-width (U+3000) spaces turned into spaces,
+# every run of spaces collapsed to one, then trimmed (close to parsing.normalize_name, which
+# folds all of \s). Runs collapse via ' ' -> char(1)||char(2), drop each char(2)||char(1),
+# then char(1)||char(2) -> ' '. VIRTUAL: computed on read (and into its index), nothing
+# stored per row.
+_NAME_SPACES_FOLDED = "name"
+for _ch in (9, 10, 13, 160, 12288):
+    _NAME_SPACES_FOLDED = f"replace({_NAME_SPACES_FOLDED}, char({_ch}), ' ')"
+ITEMS_NAME_NORM_COLUMN = (
+    "name_norm TEXT GENERATED ALWAYS AS (trim(replace(replace(replace("
+    f"{_NAME_SPACES_FOLDED}, ' ', char(1) || char(2)), char(2) || char(1), ''), char(1) || char(2), ' '))) VIRTUAL"
+)
+
 
 def get_conn() -> sqlite3.Connection:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH.as_posix(), check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH.as_posix(), check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    conn.executescript(CONNECTION_PRAGMAS)
     return conn
 
 
+_tls = threading.local()
+_thread_conns: list[sqlite3.Connection] = []
+
+
+def get_thread_conn() -> sqlite3.Connection:
+    """
+    Connection cached per thread for db.py's own entry points (init_db, wipe_all), so repeat
+    calls reuse the open handle instead of re-opening the .db / -wal / -shm files.
+    get_conn stays a factory: the app keeps one connection per browser session
+    (app.get_session_conn), and Streamlit runs a session's reruns on different threads.
+    Don't close it; cached connections are closed at interpreter exit.
+    """
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = get_conn()
+        _tls.conn = conn
+        _thread_conns.append(conn)
+    return conn
+
+
+@atexit.register
+def _close_thread_conns() -> None:
+    for conn in _thread_conns:
+        conn.close()
+    _thread_conns.clear()
+
+
+def db_file_stamp() -> tuple:
+    """
+    (mtime_ns, size) of the database file and its WAL. Under WAL a commit only touches
+    the -wal file until checkpoint, so the main file's mtime alone would miss writes.
+    """
+    stamps = []
+    for path in (DB_PATH, DB_PATH.with_name(DB_PATH.name + "-wal")):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamps.append(None)
+            continue
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+@contextmanager
+def bulk_write_pragmas(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    synchronous=OFF for the duration of a bulk write (Excel import), then back to NORMAL.
+    journal_mode stays WAL: switching it per import would need exclusive access to the file.
+    """
+    conn.execute("PRAGMA synchronous=OFF;")
+    try:
+        yield conn
+    finally:
+        conn.execute("PRAGMA synchronous=NORMAL;")
+
+
+# (id(conn), table) -> column names, filled by _column_exists so init_db's run of
+# _add_column_if_missing reads each table_info once; cleared at the start of init_db
+_colcache: dict[tuple[int, str], set[str]] = {}
+
+
 def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table});")
-    cols = [r["name"] for r in cur.fetchall()]
+    key = (id(conn), table)
+    cols = _colcache.get(key)
+    if cols is None:
+        cur = conn.cursor()
+        # table_xinfo (not table_info) so generated columns count too
+        cur.execute(f"PRAGMA table_xinfo({table});")
+        cols = _colcache[key] = {r["name"] for r in cur.fetchall()}
     return column in cols
 
 
+def _schema_object_exists(conn: sqlite3.Connection, name: str) -> bool:
+    """Table / index / trigger by name."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,))
+    return cur.fetchone() is not None
+
+
 def _add_column_if_missing(conn: sqlite3.Connection, table: str, column_def: str) -> None:
     """
     column_def example: "packed_quantity INTEGER NOT NULL DEFAULT 0"
@@ -27,88 +145,212 @@ def _add_column_if_missing(conn: sqlite3.Connection, table: str, column_def: str
     if not _column_exists(conn, table, col_name):
         cur = conn.cursor()
         cur.execute(f"ALTER TABLE {table} ADD COLUMN {column_def};")
-        conn.commit()
+        _colcache[(id(conn), table)].add(col_name)
+
+
+def _column_type(conn: sqlite3.Connection, table: str, column: str) -> str | None:
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table});")
+    for r in cur.fetchall():
+        if r["name"] == column:
+            return r["type"].upper()
+    return None
+
+
+def _stash_text_keyed_tables(conn: sqlite3.Connection) -> bool:
+    """
+    Databases created before integer keys used TEXT uuid primary keys.
+    Rename those tables to *_legacy so init_db creates the INTEGER-keyed schema;
+    _copy_legacy_tables then moves the rows over. Returns True if anything was stashed.
+    """
+    if _column_type(conn, "orders", "order_id") != "TEXT":
+        return False
+    cur = conn.cursor()
+    cur.execute("ALTER TABLE items RENAME TO items_legacy;")
+    cur.execute("ALTER TABLE orders RENAME TO orders_legacy;")
+    # Its sync triggers went with orders_legacy; recreated and rebuilt against the new table
+    cur.execute("DROP TABLE IF EXISTS orders_fts;")
+    return True
+
+
+def _copy_legacy_tables(conn: sqlite3.Connection) -> None:
+    """
+    Copy *_legacy rows into the INTEGER-keyed tables:
+      - the old uuid order_id is kept as orders.public_uuid
+      - items are re-pointed at the new integer order_id through that uuid
+    """
+    cur = conn.cursor()
+
+    def shared_columns(legacy: str, table: str, skip: set[str]) -> str:
+        cur.execute(f"PRAGMA table_info({legacy});")
+        legacy_cols = {r["name"] for r in cur.fetchall()}
+        cur.execute(f"PRAGMA table_info({table});")
+        return ", ".join(
+            r["name"] for r in cur.fetchall() if r["name"] in legacy_cols and r["name"] not in skip
+        )
+
+    # Rows that would fail the delivered CHECK on the new table
+    cur.execute("UPDATE orders_legacy SET is_delivered = 0 WHERE wants_delivery = 0 AND is_delivered <> 0;")
+
+    order_cols = shared_columns("orders_legacy", "orders", {"order_id", "public_uuid"})
+    cur.execute(f"""
+        INSERT INTO orders (public_uuid, {order_cols})
+        SELECT order_id, {order_cols} FROM orders_legacy ORDER BY rowid;
+    """)
+
+    item_cols = shared_columns("items_legacy", "items", {"item_id", "order_id"})
+    item_select = ", ".join(f"i.{c}" for c in item_cols.split(", "))
+    cur.execute(f"""
+        INSERT INTO items (order_id, {item_cols})
+        SELECT o.order_id, {item_select}
+        FROM items_legacy i
+        JOIN orders o ON o.public_uuid = i.order_id
+        ORDER BY i.rowid;
+    """)
+
+    cur.execute("DROP TABLE items_legacy;")
+    cur.execute("DROP TABLE orders_legacy;")
 
 
 def _dedupe_items_by_order_and_name(conn: sqlite3.Connection) -> None:
     """
-    Merge duplicates in items so (order_id, name) becomes unique.
+    Merge duplicates in items so (order_id, name) becomes unique. Rows are grouped on
+    (order_id, name_norm), so names differing only in whitespace (the characters folded
+    by ITEMS_NAME_NORM_COLUMN) merge too; the survivor keeps its own name.
     Strategy:
       - Keep one row (MIN(item_id)) as the survivor.
       - quantity = SUM(quantity)
       - packed_quantity = MIN(SUM(packed_quantity), SUM(quantity))
       - price = MAX(price)
       - Delete the other rows.
+    Set-based: one GROUP BY into a temp table, then one UPDATE and one DELETE
+    (no per-duplicate round trips), inside init_db's transaction.
     """
     cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS temp.item_survivors;")
     cur.execute("""
-        SELECT order_id, name, COUNT(*) AS cnt
+        CREATE TEMP TABLE item_survivors AS
+        SELECT
+          order_id,
+          name_norm,
+          MIN(item_id) AS survivor_id,
+          SUM(quantity) AS qty_sum,
+          MIN(SUM(COALESCE(packed_quantity, 0)), SUM(quantity)) AS packed_merged,
+          MAX(price) AS price_max
         FROM items
-        GROUP BY order_id, name
-        HAVING cnt > 1
+        GROUP BY order_id, name_norm
+        HAVING COUNT(*) > 1
     """)
-    dups = cur.fetchall()
-    if not dups:
-        return
 
-    for d in dups:
-        order_id = d["order_id"]
-        name = d["name"]
+    cur.execute("""
+        UPDATE items
+        SET quantity = s.qty_sum, packed_quantity = s.packed_merged, price = s.price_max
+        FROM temp.item_survivors AS s
+        WHERE items.item_id = s.survivor_id
+    """)
 
-        cur.execute("""
-            SELECT
-              MIN(item_id) AS survivor_id,
-              SUM(quantity) AS qty_sum,
-              SUM(COALESCE(packed_quantity, 0)) AS packed_sum,
-              MAX(price) AS price_max
-            FROM items
-            WHERE order_id = ? AND name = ?
-        """, (order_id, name))
-        row = cur.fetchone()
-
-        survivor_id = row["survivor_id"]
-        qty_sum = int(row["qty_sum"] or 0)
-        packed_sum = int(row["packed_sum"] or 0)
-        packed_merged = min(packed_sum, qty_sum)
-        price_max = row["price_max"]
+    cur.execute("""
+        DELETE FROM items
+        WHERE (order_id, name_norm) IN (SELECT order_id, name_norm FROM temp.item_survivors)
+          AND item_id NOT IN (SELECT survivor_id FROM temp.item_survivors)
+    """)
 
-        cur.execute("""
-            UPDATE items
-            SET quantity = ?, packed_quantity = ?, price = ?
-            WHERE item_id = ?
-        """, (qty_sum, packed_merged, price_max, survivor_id))
+    cur.execute("DROP TABLE temp.item_survivors;")
 
-        cur.execute("""
-            DELETE FROM items
-            WHERE order_id = ? AND name = ? AND item_id <> ?
-        """, (order_id, name, survivor_id))
 
-    conn.commit()
+# Applies one item row's contribution to its order; {row} is NEW / OLD, {sign} is + / -
+_ORDER_DELTA_SQL = """
+          UPDATE orders
+          SET total_dollar = ROUND(COALESCE(total_dollar, 0) {sign} {row}.quantity * COALESCE({row}.price, 0), 2),
+              item_count = item_count {sign} 1,
+              unfulfilled_count = unfulfilled_count {sign} ({row}.packed_quantity < {row}.quantity)
+          WHERE order_id = {row}.order_id;
+"""
+
+# is_fulfilled derived from the denormalized counters (no scan over items)
+_ORDER_FULFILLED_SQL = """
+          UPDATE orders
+          SET is_fulfilled = (item_count > 0 AND unfulfilled_count = 0)
+          WHERE order_id IN ({target});
+"""
+
+# Full recompute of the denormalized columns in one set-based UPDATE ... FROM (SQLite 3.33+);
+# only used to backfill existing databases
+_ORDER_ROLLUP_BACKFILL_SQL = """
+    UPDATE orders
+    SET total_dollar = agg.total_dollar,
+        item_count = agg.item_count,
+        unfulfilled_count = agg.unfulfilled_count,
+        is_fulfilled = (agg.item_count > 0 AND agg.unfulfilled_count = 0)
+    FROM (
+      SELECT o.order_id,
+             ROUND(COALESCE(SUM(i.quantity * COALESCE(i.price, 0)), 0), 2) AS total_dollar,
+             COUNT(i.item_id) AS item_count,
+             COALESCE(SUM(i.packed_quantity < i.quantity), 0) AS unfulfilled_count
+      FROM orders o
+      LEFT JOIN items i ON i.order_id = o.order_id
+      GROUP BY o.order_id
+    ) AS agg
+    WHERE orders.order_id = agg.order_id;
+"""
 
 
 def init_db() -> None:
-    conn = get_conn()
+    """
+    Create / migrate the schema in one transaction: one commit (one WAL sync) per startup,
+    and a migration that fails part-way leaves the database as it was.
+    """
+    conn = get_thread_conn()
     cur = conn.cursor()
+    _colcache.clear()
+    # foreign_keys is a no-op inside a transaction, so it's switched off around it
+    # (the legacy copy renames / drops the tables items references)
+    cur.execute("PRAGMA foreign_keys=OFF;")
+    cur.execute("BEGIN IMMEDIATE;")
+    try:
+        _create_or_migrate_schema(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("PRAGMA foreign_keys=ON;")
+
+
+def _create_or_migrate_schema(conn: sqlite3.Connection) -> None:
+    cur = conn.cursor()
+
+    # Integer keys: order_id / item_id alias the rowid, so every key compare and
+    # index entry is a small varint instead of a 36-byte uuid string.
+    # public_uuid is only an external label (never indexed or joined on at runtime).
+    orders_existed = _schema_object_exists(conn, "orders")
+    has_legacy_tables = orders_existed and _stash_text_keyed_tables(conn)
+    cur.execute("PRAGMA user_version;")
+    schema_version = cur.fetchone()[0]
+    # Already migrated by this code: dedupe and trigger rebuilds are no-ops, skip them
+    schema_current = schema_version >= SCHEMA_VERSION and not has_legacy_tables
 
     # Orders table (includes is_delivered)
-    cur.execute("""
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS orders (
-      order_id TEXT PRIMARY KEY,
+      order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+      public_uuid TEXT,
       customer TEXT NOT NULL,
       total_dollar REAL,
       is_paid INTEGER NOT NULL DEFAULT 0,
       wants_delivery INTEGER NOT NULL DEFAULT 0,
       is_fulfilled INTEGER NOT NULL DEFAULT 0,
       is_delivered INTEGER NOT NULL DEFAULT 0,
-      created_at TEXT DEFAULT (datetime('now'))
+      created_at TEXT DEFAULT (datetime('now')),
+      {ORDERS_DELIVERED_CHECK}
     );
     """)
 
     # Items table
     cur.execute("""
     CREATE TABLE IF NOT EXISTS items (
-      item_id TEXT PRIMARY KEY,
-      order_id TEXT NOT NULL,
+      item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+      order_id INTEGER NOT NULL,
       name TEXT NOT NULL,
       quantity INTEGER NOT NULL,
       price REAL,
@@ -126,10 +368,9 @@ def init_db() -> None:
     );
     """)
 
-    conn.commit()
-
     # Migration safety
     _add_column_if_missing(conn, "items", "packed_quantity INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "items", ITEMS_NAME_NORM_COLUMN)
     _add_column_if_missing(conn, "orders", "is_delivered INTEGER NOT NULL DEFAULT 0")
     _add_column_if_missing(conn, "orders", "delivery_address TEXT")
     _add_column_if_missing(conn, "orders", "delivery_distance_miles REAL")
@@ -140,66 +381,198 @@ def init_db() -> None:
     _add_column_if_missing(conn, "orders", "change_given REAL DEFAULT 0")
     _add_column_if_missing(conn, "orders", "change_status TEXT DEFAULT 'pending'")
     _add_column_if_missing(conn, "orders", "is_handed_off INTEGER DEFAULT 0")
+    needs_rollup_backfill = has_legacy_tables or not _column_exists(conn, "orders", "unfulfilled_count")
+    _add_column_if_missing(conn, "orders", "item_count INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "orders", "unfulfilled_count INTEGER NOT NULL DEFAULT 0")
+
+    if has_legacy_tables:
+        _copy_legacy_tables(conn)
 
     # Enforce uniqueness for (order_id, name)
-    _dedupe_items_by_order_and_name(conn)
+    # The (order_id, name_norm) index lets the dedupe GROUP BY stream in index order
+    # instead of sorting items into a temp b-tree. The unique index stays on the raw
+    # name: it is the ON CONFLICT target of the app's item upsert.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_items_order_namenorm ON items(order_id, name_norm);")
+    if not (schema_current and _schema_object_exists(conn, "idx_items_order_name_unique")):
+        _dedupe_items_by_order_and_name(conn)
     cur.execute("""
         CREATE UNIQUE INDEX IF NOT EXISTS idx_items_order_name_unique
         ON items(order_id, name);
     """)
-    conn.commit()
+    # Orders list is read newest-first; the (order_id, name) index above already
+    # serves every items WHERE order_id = ? lookup.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at DESC);")
 
     # -----------------------------
     # HARD ENFORCEMENT FOR DELIVERED
     # -----------------------------
-    # 1) Normalize existing bad data (if any)
-    cur.execute("""
-        UPDATE orders
-        SET is_delivered = 0
-        WHERE wants_delivery = 0 AND is_delivered <> 0;
-    """)
-    conn.commit()
-
-    # 2) Block invalid INSERTs: cannot create delivered=1 when wants_delivery=0
-    cur.execute("""
-    CREATE TRIGGER IF NOT EXISTS trg_orders_delivered_insert_guard
-    BEFORE INSERT ON orders
-    WHEN NEW.wants_delivery = 0 AND NEW.is_delivered <> 0
-    BEGIN
-      SELECT RAISE(ABORT, 'Invalid: is_delivered can only be 1 when wants_delivery is 1');
-    END;
-    """)
-
-    # 3) Block invalid UPDATEs: cannot set delivered=1 if wants_delivery=0
-    cur.execute("""
-    CREATE TRIGGER IF NOT EXISTS trg_orders_delivered_update_guard
-    BEFORE UPDATE OF is_delivered ON orders
-    WHEN NEW.wants_delivery = 0 AND NEW.is_delivered <> 0
-    BEGIN
-      SELECT RAISE(ABORT, 'Invalid: cannot set is_delivered=1 when wants_delivery=0');
-    END;
-    """)
+    # ORDERS_DELIVERED_CHECK on the table replaces the old per-row guard triggers.
+    # The wants_delivery -> 0 auto-reset trigger is gone too: the CHECK rejects the
+    # UPDATE before an AFTER trigger could run, so clear is_delivered in the same UPDATE.
+    # (Older databases had those triggers on their TEXT-keyed orders table; they are
+    # dropped with orders_legacy once its rows are copied into the CHECK-ed table.)
 
-    # 4) Auto-fix: if wants_delivery is changed to 0, force is_delivered back to 0
-    cur.execute("""
-    CREATE TRIGGER IF NOT EXISTS trg_orders_wants_delivery_force_reset
-    AFTER UPDATE OF wants_delivery ON orders
-    WHEN NEW.wants_delivery = 0
-    BEGIN
-      UPDATE orders SET is_delivered = 0 WHERE order_id = NEW.order_id;
-    END;
-    """)
-    conn.commit()
+    # -----------------------------
+    # ITEMS -> ORDERS ROLLUP (total_dollar / item_count / unfulfilled_count / is_fulfilled)
+    # -----------------------------
+    # Any item write applies its delta to the order row, so the app issues a single
+    # statement per edit and no aggregate over items is ever re-run.
+    # Dropped + recreated whenever the schema version is behind, so definition changes
+    # reach existing databases (bump SCHEMA_VERSION with them).
+    rollup_triggers = (
+        ("trg_items_rollup_insert", "AFTER INSERT ON items", ("NEW",), "NEW.order_id"),
+        (
+            "trg_items_rollup_update",
+            "AFTER UPDATE OF order_id, quantity, price, packed_quantity ON items",
+            ("OLD", "NEW"),
+            "OLD.order_id, NEW.order_id",
+        ),
+        ("trg_items_rollup_delete", "AFTER DELETE ON items", ("OLD",), "OLD.order_id"),
+    )
+    for trigger_name, event, rows, target in rollup_triggers:
+        if schema_current and _schema_object_exists(conn, trigger_name):
+            continue
+        deltas = "".join(
+            _ORDER_DELTA_SQL.format(row=row, sign="-" if row == "OLD" else "+") for row in rows
+        )
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger_name};")
+        cur.execute(f"""
+        CREATE TRIGGER {trigger_name}
+        {event}
+        BEGIN
+          {deltas}
+          {_ORDER_FULFILLED_SQL.format(target=target)}
+        END;
+        """)
 
-    conn.close()
+    # -----------------------------
+    # CUSTOMER SEARCH INDEX (FTS5)
+    # -----------------------------
+    # External-content FTS5 table over orders.customer, kept in sync by triggers.
+    # The trigram tokenizer gives case-insensitive substring matches (same semantics
+    # as LIKE '%...%') but served from the index instead of a full scan of orders.
+    # Savepoint so a half-created FTS setup is undone without aborting the outer transaction
+    cur.execute("SAVEPOINT orders_fts_setup;")
+    try:
+        needs_fts_rebuild = not _schema_object_exists(conn, "orders_fts")
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts
+        USING fts5(customer, content='orders', content_rowid='rowid', tokenize='trigram');
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_insert
+        AFTER INSERT ON orders
+        BEGIN
+          INSERT INTO orders_fts(rowid, customer) VALUES (NEW.rowid, NEW.customer);
+        END;
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_update
+        AFTER UPDATE OF customer ON orders
+        BEGIN
+          INSERT INTO orders_fts(orders_fts, rowid, customer) VALUES ('delete', OLD.rowid, OLD.customer);
+          INSERT INTO orders_fts(rowid, customer) VALUES (NEW.rowid, NEW.customer);
+        END;
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_delete
+        AFTER DELETE ON orders
+        BEGIN
+          INSERT INTO orders_fts(orders_fts, rowid, customer) VALUES ('delete', OLD.rowid, OLD.customer);
+        END;
+        """)
+        if needs_fts_rebuild:
+            cur.execute("INSERT INTO orders_fts(orders_fts) VALUES ('rebuild');")
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 / trigram (< 3.34): the app falls back to pandas filtering
+        cur.execute("ROLLBACK TO orders_fts_setup;")
+    cur.execute("RELEASE orders_fts_setup;")
 
+    if needs_rollup_backfill:
+        cur.execute(_ORDER_ROLLUP_BACKFILL_SQL)
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
 
 
-def wipe_all() -> None:
-    conn = get_conn()
+def delete_all_rows(conn: sqlite3.Connection) -> None:
+    """
+    Empty items / orders / catalog without committing, so an import can wipe and
+    reload inside one transaction (a failed import then leaves the old data intact).
+    """
     cur = conn.cursor()
     cur.execute("DELETE FROM items;")
     cur.execute("DELETE FROM orders;")
     cur.execute("DELETE FROM catalog;")
-    conn.commit()
-    conn.close()
+
+
+def wipe_all() -> None:
+    conn = get_thread_conn()
+    conn.execute("BEGIN")
+    try:
+        delete_all_rows(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+ORDER_INSERT_COLUMNS = (
+    "public_uuid", "customer", "total_dollar", "is_paid", "wants_delivery", "is_fulfilled", "is_delivered"
+)
+ITEM_INSERT_COLUMNS = ("order_id", "name", "quantity", "price", "is_checked", "packed_quantity")
+
+# Rows per multi-row INSERT; also capped by the connection's bound-parameter limit
+_INSERT_CHUNK_ROWS = 500
+
+
+def _df_to_rows(df: pd.DataFrame, columns: tuple[str, ...]) -> Iterator[tuple]:
+    """
+    DataFrame -> plain-Python tuples for executemany (NaN -> None, numpy scalars -> int/float).
+    Streamed straight from itertuples; no intermediate list of rows.
+    """
+    sub = df[list(columns)].astype(object)
+    return sub.where(sub.notna(), None).itertuples(index=False, name=None)
+
+
+def _insert_rows_multi(
+    cur: sqlite3.Cursor,
+    table: str,
+    columns: tuple[str, ...],
+    rows: Iterator[tuple],
+    max_variables: int,
+) -> None:
+    """
+    INSERT with multi-row VALUES lists (what pandas' to_sql(method="multi") emits): one
+    statement execution per chunk of rows instead of one per row. Every full chunk uses
+    the same SQL text, so it is prepared once and then served from the statement cache.
+    max_variables is the connection's SQLITE_LIMIT_VARIABLE_NUMBER.
+    """
+    chunk_rows = max(1, min(_INSERT_CHUNK_ROWS, max_variables // len(columns)))
+    head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    row_sql = f"({', '.join('?' * len(columns))})"
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_rows)):
+        cur.execute(head + ", ".join([row_sql] * len(chunk)), [v for row in chunk for v in row])
+
+
+def bulk_insert_orders(conn: sqlite3.Connection, orders_df: pd.DataFrame, items_df: pd.DataFrame) -> None:
+    """
+    Insert parsed orders, then their items, as multi-row INSERTs. Caller owns the
+    transaction (pandas' to_sql would commit on a sqlite3 connection, splitting the import).
+      - orders_df: ORDER_INSERT_COLUMNS; public_uuid is the parser's order id
+      - items_df: ITEM_INSERT_COLUMNS, order_id still holding that public_uuid; it is
+        re-pointed at the integer order_id SQLite assigns to each new order
+    """
+    max_variables = conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(order_id), 0) FROM orders;")
+    last_order_id = cur.fetchone()[0]
+    _insert_rows_multi(
+        cur, "orders", ORDER_INSERT_COLUMNS, _df_to_rows(orders_df, ORDER_INSERT_COLUMNS), max_variables
+    )
+
+    cur.execute("SELECT public_uuid, order_id FROM orders WHERE order_id > ?;", (last_order_id,))
+    new_ids = dict(cur.fetchall())
+    items_df = items_df.assign(order_id=items_df["order_id"].map(new_ids))
+    _insert_rows_multi(
+        cur, "items", ITEM_INSERT_COLUMNS, _df_to_rows(items_df, ITEM_INSERT_COLUMNS), max_variables
+    )
@@ -1,14 +1,26 @@
 import re
+import os
 import uuid
-import math
+import ahocorasick
+import numpy as np
 import pandas as pd
 from typing import Tuple, Dict, Optional, List
 
+# Rust xlsx reader (python-calamine); pandas has shipped this engine since 2.2
+EXCEL_ENGINE = "calamine"
+
+# Compiled once at import; used by normalize_name and the order-content parser
+_RE_WS = re.compile(r"\s+")
+_RE_SPLIT = re.compile(r"[，,]\s*")
+# Trailing 'xN' quantity; group 1 is the name before it (leftmost such x), group 2 is N
+_RE_QTY = re.compile(r"^(.*?)x\s*(\d+)\s*$", re.DOTALL)
+
 
 def parse_item_catalog(
-    file_path: str,
+    file_path: str | None = None,
     sheet_name: int | str = 0,
     *,
+    df: pd.DataFrame | None = None,
     summary_marker: str = "商品汇总",
     product_header: str = "商品",
     price_header: str = "单价",
@@ -26,8 +38,12 @@ def parse_item_catalog(
       - The sheet has a row containing `商品汇总`
       - Immediately below are rows for 商品 + 单价 + 数量 + 金额, then item rows, then 总计
       - Item rows have a string in the 商品 column and numeric 单价
+    Pass `df` (the already-read sheet) instead of `file_path` to skip reading the file again.
     """
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    if df is None:
+        if file_path is None:
+            raise ValueError("Pass either file_path or df.")
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine=EXCEL_ENGINE)
 
     if df.shape[1] < 2:
         raise ValueError("Expected at least 2 columns in the sheet.")
@@ -43,47 +59,182 @@ def parse_item_catalog(
 
     summary_start_idx = int(df.index[marker_mask][0])
 
-    rows = []
-    for i in range(summary_start_idx + 1, len(df)):
-        name = df.at[i, col0]
-        price = df.at[i, col1]
-
-        # Stop at 总计 row
-        if isinstance(name, str) and name.strip() == total_marker:
-            break
-
-        # Skip header rows
-        if isinstance(name, str) and name.strip() in {product_header, summary_marker, total_marker}:
-            continue
-
-        # Valid item row
-        if isinstance(name, str) and name.strip():
-            if isinstance(price, (int, float)) and not pd.isna(price):
-                row = {
-                    "item_name": name.strip(),
-                    "unit_price": float(price),
-                    "summary_qty": float(df.at[i, col2]) if col2 is not None and pd.notna(df.at[i, col2]) else None,
-                    "summary_amount": float(df.at[i, col3]) if col3 is not None and pd.notna(df.at[i, col3]) else None,
-                }
-                rows.append(row)
-
-    if not rows:
+    # Pull the section out of the frame once as plain arrays (no per-cell .at lookups)
+    start = summary_start_idx + 1
+    names = df[col0].to_numpy(dtype=object)[start:]
+    prices = df[col1].to_numpy(dtype=object)[start:]
+    qtys = df[col2].to_numpy(dtype=object)[start:] if col2 is not None else np.full(len(names), None)
+    amounts = df[col3].to_numpy(dtype=object)[start:] if col3 is not None else np.full(len(names), None)
+    stripped = np.array([n.strip() if isinstance(n, str) else None for n in names], dtype=object)
+
+    # Stop at 总计 row
+    total_hits = np.flatnonzero(stripped == total_marker)
+    stop = int(total_hits[0]) if len(total_hits) else len(stripped)
+    stripped, prices, qtys, amounts = stripped[:stop], prices[:stop], qtys[:stop], amounts[:stop]
+
+    # Valid item rows: non-empty, non-header name and a numeric price (header rows are skipped)
+    header_set = frozenset((product_header, summary_marker, total_marker))
+    valid = np.array(
+        [
+            bool(name) and name not in header_set and isinstance(price, (int, float)) and not pd.isna(price)
+            for name, price in zip(stripped, prices)
+        ],
+        dtype=bool,
+    )
+    if not valid.any():
         raise ValueError("Found summary marker but did not parse any valid item rows with numeric unit prices.")
 
-    items_catalog_df = pd.DataFrame(rows).drop_duplicates(subset=["item_name"], keep="last").reset_index(drop=True)
+    items_catalog_df = pd.DataFrame(
+        {
+            "item_name": stripped[valid].tolist(),
+            "unit_price": prices[valid].astype(float).tolist(),
+            "summary_qty": [float(q) if pd.notna(q) else None for q in qtys[valid]],
+            "summary_amount": [float(a) if pd.notna(a) else None for a in amounts[valid]],
+        }
+    )
+    items_catalog_df = items_catalog_df.drop_duplicates(subset=["item_name"], keep="last").reset_index(drop=True)
     price_map = dict(zip(items_catalog_df["item_name"], items_catalog_df["unit_price"]))
 
     return items_catalog_df, price_map
 
 
+def _random_ids(n: int) -> List[str]:
+    """
+    n random version-4 uuid strings (same format as str(uuid.uuid4()), which the app uses
+    for orders it creates), with the entropy sliced from a single os.urandom draw.
+    """
+    blob = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=blob[i : i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+
 def normalize_name(s: str) -> str:
-    return re.sub(r"\s+", " ", str(s).strip())
+    return _RE_WS.sub(" ", str(s).strip())
+
+
+def normalize_price_map(price_map: Dict[str, float]) -> Dict[str, float]:
+    """price_map keyed by normalize_name(item name): the form every price lookup matches against."""
+    return {normalize_name(k): v for k, v in price_map.items()}
+
+
+def sorted_catalog_keys(norm_price_map: Dict[str, float]) -> List[str]:
+    """Normalized catalog keys longest first (ties: larger key first), the substring fallback's scan order."""
+    return sorted(norm_price_map, key=lambda k: (len(k), k), reverse=True)
+
+
+def build_catalog_automaton(norm_price_map: Dict[str, float]):
+    """Aho-Corasick automaton over the normalized catalog keys (None for an empty catalog)."""
+    if not norm_price_map:
+        return None
+    automaton = ahocorasick.Automaton()
+    for k in norm_price_map:
+        automaton.add_word(k, (len(k), k))
+    automaton.make_automaton()
+    return automaton
+
+
+def _match_catalog_name(name: str, sorted_keys: List[str], automaton) -> Optional[str]:
+    """
+    Substring fallback for a name with no exact price: the longest normalized catalog
+    key that contains `name` or is contained in it (ties go to the larger key).
+      - keys inside `name`: one linear walk of the automaton over `name`
+      - keys containing `name`: only keys longer than it can, and sorted_keys
+        (sorted_catalog_keys) lists those first in preference order, so the first hit wins
+    """
+    candidates = [value for _, value in automaton.iter(name)] if automaton is not None else []
+    for k in sorted_keys:
+        if len(k) <= len(name):
+            break
+        if name in k:
+            candidates.append((len(k), k))
+            break
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def _parse_order_segments(
+    contents: pd.Series,
+    norm_price_map: Dict[str, float],
+    *,
+    sorted_keys: Optional[List[str]] = None,
+    automaton=None,
+    delivery_prefixes: Tuple[str, ...] = ("选择配送",),
+) -> Tuple[pd.Series, pd.DataFrame, pd.DataFrame]:
+    """
+    parse_order_content over a whole column at once: every cell is split into one row
+    per segment and tokenized with pandas string methods, so the per-row work runs in
+    the str kernels instead of a Python loop over orders.
+    Returns (all in content order, order_pos = position in `contents`):
+      - wants_delivery: bool Series aligned with `contents`
+      - items_df: [order_pos, name, quantity, price]  (price NaN when unmatched)
+      - warnings_df: [order_pos, warning]
+    norm_price_map comes from normalize_price_map; sorted_keys and the automaton are
+    built here on first need unless the caller passes them.
+    """
+    # Object dtype keeps Python `re` semantics (Unicode \s / \d); Arrow-backed strings use RE2
+    text = pd.Series(contents.astype(str).to_numpy(dtype=object))
+    segs = text.str.split(_RE_SPLIT).explode().astype(object).str.strip()
+    segs = segs.rename_axis("order_pos").reset_index(name="seg")
+    segs = segs[segs["seg"].ne("") & ~segs["seg"].str.contains("总价", regex=False)]
+
+    # Delivery lines only set the flag; they never become items
+    is_delivery = segs["seg"].str.startswith(delivery_prefixes)
+    wants_delivery = (
+        is_delivery.groupby(segs["order_pos"]).any().reindex(range(len(text)), fill_value=False).astype(bool)
+    )
+    segs = segs[~is_delivery]
+
+    # Quantity must end the segment as xN; the name is everything before that x
+    parts = segs["seg"].str.extract(_RE_QTY)
+    has_qty = parts[1].notna()
+    skipped = segs.loc[~has_qty, ["order_pos"]].assign(
+        warning="Skipped segment without trailing quantity 'xN': " + segs.loc[~has_qty, "seg"]
+    )
+
+    items = segs.loc[has_qty, ["order_pos"]].assign(
+        name=parts.loc[has_qty, 0].str.strip().str.replace(_RE_WS, " ", regex=True),
+        quantity=parts.loc[has_qty, 1].map(int),
+    )
+
+    # Price lookup: hash join against the normalized catalog on the exact name ...
+    norm_catalog = pd.DataFrame(
+        {
+            "name": pd.Series(list(norm_price_map.keys()), dtype=object),
+            "price": pd.Series(list(norm_price_map.values()), dtype=float),
+        }
+    )
+    merged = items.merge(norm_catalog, on="name", how="left", indicator=True, validate="many_to_one")
+    merged.index = items.index  # left join keeps row order; index carries content order
+    unmatched = merged.pop("_merge").eq("left_only")
+    items = merged
+
+    # ... then longest substring match, once per distinct unmatched name
+    unmatched_names = items.loc[unmatched, "name"].unique()
+    if len(unmatched_names):
+        if sorted_keys is None:
+            sorted_keys = sorted_catalog_keys(norm_price_map)
+        if automaton is None:
+            automaton = build_catalog_automaton(norm_price_map)
+    snapped = {name: _match_catalog_name(name, sorted_keys, automaton) for name in unmatched_names}
+    canonical = items.loc[unmatched, "name"].map(snapped)
+    found = canonical.notna()
+    items.loc[found[found].index, "name"] = canonical[found]  # snap to canonical catalog name
+    items.loc[found[found].index, "price"] = canonical[found].map(norm_price_map).astype(float)
+
+    missing = items.loc[canonical[~found].index]
+    missing_price = missing[["order_pos"]].assign(warning="Missing price match for item: '" + missing["name"] + "'")
+
+    warnings_df = pd.concat([skipped, missing_price]).sort_index()
+    return wants_delivery, items.reset_index(drop=True), warnings_df.reset_index(drop=True)
 
 
 def parse_order_content(
     content: str,
     price_map: Dict[str, float],
     *,
+    norm_price_map: Optional[Dict[str, float]] = None,
+    sorted_keys: Optional[List[str]] = None,
+    automaton=None,
     delivery_prefixes: Tuple[str, ...] = ("选择配送",),
 ) -> Tuple[bool, List[Dict[str, Optional[float]]], List[str]]:
     """
@@ -99,45 +250,50 @@ def parse_order_content(
       - Extract quantity from trailing 'xN'.
       - Resolve price by matching name to price_map (exact after whitespace normalization),
         falling back to substring matching (longest match).
+    Same rules as _parse_order_segments (the column-wise parser used for whole sheets), as
+    a plain loop: a single cell doesn't pay for building Series / DataFrames and a merge.
+    When parsing many cells against one catalog, pass norm_price_map (normalize_price_map),
+    sorted_keys (sorted_catalog_keys) and automaton (build_catalog_automaton) so they are
+    built once, not per cell.
     """
     wants_delivery = False
     items: List[Dict[str, Optional[float]]] = []
     warnings: List[str] = []
 
-    # Normalize price map keys once
-    norm_price_map = {normalize_name(k): v for k, v in price_map.items()}
+    if norm_price_map is None:
+        norm_price_map = normalize_price_map(price_map)
 
     text = str(content) if content is not None else ""
-    parts = re.split(r"[，,]\s*", text)
-
-    for raw_part in parts:
-        p = raw_part.strip().strip(" ，,")
+    for raw_part in _RE_SPLIT.split(text):
+        p = raw_part.strip()
         if not p or "总价" in p:
             continue
 
         # Delivery detection (treat as boolean)
-        if any(p.startswith(prefix) for prefix in delivery_prefixes):
+        if p.startswith(delivery_prefixes):
             wants_delivery = True
             continue
 
         # Quantity parsing (must end with xN)
-        m = re.search(r"x\s*(\d+)\s*$", p)
+        m = _RE_QTY.match(p)
         if not m:
             warnings.append(f"Skipped segment without trailing quantity 'xN': {p}")
             continue
 
-        qty = int(m.group(1))
-        name = normalize_name(p[: m.start()])
+        qty = int(m.group(2))
+        name = normalize_name(m.group(1))
 
         # Price lookup: exact normalized key
         price = norm_price_map.get(name)
 
         # Fallback: longest substring match
         if price is None:
-            candidates = [(len(k), k) for k in norm_price_map.keys() if k in name or name in k]
-            if candidates:
-                candidates.sort(reverse=True)
-                canonical = candidates[0][1]
+            if sorted_keys is None:
+                sorted_keys = sorted_catalog_keys(norm_price_map)
+            if automaton is None:
+                automaton = build_catalog_automaton(norm_price_map)
+            canonical = _match_catalog_name(name, sorted_keys, automaton)
+            if canonical is not None:
                 price = norm_price_map[canonical]
                 name = canonical  # snap to canonical catalog name
             else:
@@ -173,15 +329,17 @@ def parse_orders_and_items(
       - isFulfilled defaults False (you can derive it from item checkboxes later)
       - totalDollar computed from parsed items when all prices are known; otherwise None
     """
-    # 1) Item catalog + price map
+    # 1) Read the sheet once; both sections are parsed from the same DataFrame
+    with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as xl:
+        df = xl.parse(sheet_name)
+
+    # 2) Item catalog + price map
     catalog_df, price_map = parse_item_catalog(
-        file_path,
-        sheet_name=sheet_name,
+        df=df,
         summary_marker=summary_marker,
     )
 
-    # 2) Load sheet for orders section parsing
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    # 3) Orders section parsing
     if df.shape[1] < 3:
         raise ValueError("Expected at least 3 columns for orders section parsing.")
 
@@ -207,61 +365,65 @@ def parse_orders_and_items(
     # Keep only rows with customer + content
     orders_raw = orders_raw[orders_raw["customer"].notna() & orders_raw["content"].notna()].copy()
 
-    # 3) Build outputs
-    orders_out = []
-    items_out = []
-    issues_out = []
-
-    for _, row in orders_raw.iterrows():
-        order_id = str(uuid.uuid4())
-        customer = str(row["customer"]).strip()
-        content = str(row["content"])
+    # 4) Build outputs
+    customers = orders_raw["customer"].astype(str).str.strip().tolist()
+    contents = orders_raw["content"].astype(str)
+    wants_delivery, items_df, warnings_df = _parse_order_segments(contents, normalize_price_map(price_map))
+
+    # One entropy draw for every order and item id
+    ids = _random_ids(len(orders_raw) + len(items_df))
+    order_ids, item_ids = ids[: len(orders_raw)], ids[len(orders_raw) :]
+
+    # Total when all prices are known
+    line_total = items_df["quantity"] * items_df["price"]
+    totals = line_total.groupby(items_df["order_pos"]).sum().reindex(range(len(orders_raw)), fill_value=0.0)
+    missing_price = items_df["price"].isna().groupby(items_df["order_pos"]).any()
+    totals = totals.round(2).astype(object)
+    totals[missing_price[missing_price].index] = None
+
+    orders_df = pd.DataFrame(
+        {
+            "orderId": order_ids,
+            "customer": customers,
+            "totalDollar": totals.tolist(),
+            "isPaid": False,
+            "wantsDelivery": wants_delivery.tolist(),
+            "isFulfilled": False,
+        },
+        columns=["orderId", "customer", "totalDollar", "isPaid", "wantsDelivery", "isFulfilled"],
+    )
 
-        wants_delivery, items, warnings = parse_order_content(content, price_map)
+    order_pos = items_df["order_pos"].to_numpy()
+    items_df = pd.DataFrame(
+        {
+            "itemId": item_ids,
+            "orderId": [order_ids[p] for p in order_pos],
+            "name": items_df["name"].tolist(),
+            "quantity": items_df["quantity"].astype(int).tolist(),
+            "price": items_df["price"].tolist(),
+            "isChecked": False,
+        },
+        columns=["itemId", "orderId", "name", "quantity", "price", "isChecked"],
+    )
 
-        # Compute total when all prices are known
-        total = 0.0
-        missing_price = False
-        for it in items:
-            if it["price"] is None or (isinstance(it["price"], float) and math.isnan(it["price"])):
-                missing_price = True
-            else:
-                total += int(it["quantity"]) * float(it["price"])
-
-        orders_out.append(
-            {
-                "orderId": order_id,
-                "customer": customer,
-                "totalDollar": None if missing_price else round(total, 2),
-                "isPaid": False,
-                "wantsDelivery": wants_delivery,
-                "isFulfilled": False,
-            }
-        )
-
-        for it in items:
-            items_out.append(
-                {
-                    "itemId": str(uuid.uuid4()),
-                    "orderId": order_id,
-                    "name": it["name"],
-                    "quantity": int(it["quantity"]),
-                    "price": it["price"],
-                    "isChecked": False,
-                }
-            )
-
-        for w in warnings:
-            issues_out.append({"orderId": order_id, "customer": customer, "warning": w, "content_sample": content[:150]})
-
-        if not items:
-            issues_out.append(
-                {"orderId": order_id, "customer": customer, "warning": "No parsed items", "content_sample": content[:150]}
-            )
-
-    orders_df = pd.DataFrame(orders_out)
-    items_df = pd.DataFrame(items_out)
-    issues_df = pd.DataFrame(issues_out)
+    # Per-order warnings in content order, then "No parsed items" for orders without any
+    no_items = sorted(set(range(len(orders_raw))) - set(order_pos.tolist()))
+    issue_rows = pd.concat(
+        [
+            warnings_df.assign(_rank=0),
+            pd.DataFrame({"order_pos": no_items, "warning": "No parsed items", "_rank": 1}),
+        ],
+        ignore_index=True,
+    ).sort_values(["order_pos", "_rank"], kind="stable")
+    issues_df = pd.DataFrame(
+        {
+            "orderId": [order_ids[p] for p in issue_rows["order_pos"]],
+            "customer": [customers[p] for p in issue_rows["order_pos"]],
+            "warning": issue_rows["warning"].tolist(),
+            "content_sample": [contents.iloc[p][:150] for p in issue_rows["order_pos"]],
+        },
+        columns=["orderId", "customer", "warning", "content_sample"],
+    )
 
     # Optional: Checklist view for UI
     checklist_df = items_df.merge(